@@ -0,0 +1,96 @@
+"""Maintenance commands.
+
+    python -m app.cli migrate [--check]
+    python -m app.cli rebuild-stats
+    python -m app.cli recommendations [--output PATH] [--full]
+    python -m app.cli archive [--older-than-days N] [--batch-size N] [--max-batches N] [--dry-run]
+"""
+import argparse
+import json
+import sys
+from .db import SessionLocal
+
+def migrate(args) -> int:
+    from .db import get_engine
+    from .migrations import SCHEMA_VERSION, current_version, migrate as apply_migrations
+    engine = get_engine()
+    version = current_version(engine)
+    if args.check:
+        print(json.dumps({"current": version, "expected": SCHEMA_VERSION}))
+        return 0 if version == SCHEMA_VERSION else 1
+    start, end = apply_migrations(engine)
+    print(json.dumps({"from": start, "to": end}))
+    return 0
+
+def rebuild_stats(args) -> int:
+    from .utils.circulation import rebuild
+    db = SessionLocal()
+    try:
+        print(json.dumps(rebuild(db)))
+    finally:
+        db.close()
+    return 0
+
+def recommendations(args) -> int:
+    import os
+    from .db import read_session
+    from .utils.recommendations import refresh, save, load_snapshot
+    if not args.output:
+        print("Set RECOMMENDATIONS_PATH or pass --output", file=sys.stderr)
+        return 1
+    # Incremental from the previous artifact unless a full build is asked for or due
+    snapshot = None if args.full or not os.path.exists(args.output) else load_snapshot(args.output)
+    db = read_session()
+    try:
+        snapshot, report = refresh(db, snapshot, full=args.full)
+    finally:
+        db.close()
+    save(snapshot, args.output)
+    print(json.dumps(report))
+    return 0
+
+def archive(args) -> int:
+    from .jobs.archive import archive_history, count_archivable
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            print(json.dumps({"archivable": count_archivable(db, args.older_than_days)}))
+            return 0
+        moved = archive_history(db, args.older_than_days, args.batch_size, max_batches=args.max_batches)
+    finally:
+        db.close()
+    if moved is None:
+        print("Another process is archiving", file=sys.stderr)
+        return 1
+    print(json.dumps({"moved": moved}))
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Library management maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="Bring the database schema up to date")
+    migrate_parser.add_argument("--check", action="store_true", help="Only report; exit 1 if the schema is behind")
+    migrate_parser.set_defaults(handler=migrate)
+
+    commands.add_parser("rebuild-stats", help="Recompute the circulation rollups from borrow history").set_defaults(handler=rebuild_stats)
+
+    from .utils.recommendations import RECOMMENDATIONS_PATH
+    recommendations_parser = commands.add_parser("recommendations", help="Build or update the recommendation model artifact")
+    recommendations_parser.add_argument("--output", default=RECOMMENDATIONS_PATH, help="Artifact path (default: RECOMMENDATIONS_PATH)")
+    recommendations_parser.add_argument("--full", action="store_true", help="Rebuild from the whole history instead of updating")
+    recommendations_parser.set_defaults(handler=recommendations)
+
+    from .jobs.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+    archive_parser = commands.add_parser("archive", help="Move old returned loans to borrow_history_archive")
+    archive_parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    archive_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    archive_parser.add_argument("--max-batches", type=int, help="Stop after this many batches (default: until done)")
+    archive_parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+    archive_parser.set_defaults(handler=archive)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
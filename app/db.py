@@ -1,11 +1,29 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
-from dotenv import load_dotenv
+import threading
+from pathlib import Path
 from urllib.parse import quote_plus
+from fastapi import Request
+from .utils.instrumentation import instrument_engine, TimedQueuePool, TimedAsyncAdaptedQueuePool
+from .utils.replicas import ReplicaSet, RoutingSession
+
+def _load_env_file():
+    """Load the nearest .env file at or above this package, as load_dotenv() would.
+
+    Runs at import because DATABASE_URL below and the settings of every other
+    module are read from the environment when they are imported. dotenv itself
+    is only imported when there is a file to read.
+    """
+    for directory in Path(__file__).resolve().parents:
+        path = directory / ".env"
+        if path.is_file():
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
 
 # Load environment variables from .env file
-load_dotenv()
+_load_env_file()
 
 # Read database config from .env file
 DB_HOST = os.getenv("DB_HOST")
@@ -13,31 +31,168 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
-# Encoding the password to handle special characters
-encoded_password = quote_plus(DB_PASSWORD)
+# SQLAlchemy Database URL (DATABASE_URL overrides the MySQL settings, e.g. sqlite:///./library.db for local runs)
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    # Encoding the password to handle special characters
+    encoded_password = quote_plus(DB_PASSWORD)
+    DATABASE_URL = f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}"
+
+def _engine_options(url: str, poolclass) -> dict:
+    "Engine and pool settings from the environment."
+    options = {
+        "echo": os.getenv("DB_ECHO", "0") == "1",
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    # SQLite uses its own pool classes that don't take sizing arguments
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=poolclass,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "3600")),
+        )
+    return options
+
+# Read replicas (comma-separated URLs); GET requests read from one of them
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# After a write, the client's reads stay on the primary this long (via a cookie) to cover replication lag
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+PRIMARY_COOKIE = "db_primary"
+
+# Async mode (DB_ASYNC=1) serves the read routes from an AsyncSession instead of a threadpool thread
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+def _async_url(url: str) -> str:
+    "Swap the sync driver in a database URL for its async counterpart."
+    if url.startswith("mysql+pymysql://"):
+        return "mysql+aiomysql://" + url[len("mysql+pymysql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Engines are built on first use rather than on import, so importing the app (tools, tests,
+# worker boot) doesn't load drivers or set up pools it may never touch.
+# `db.engine`, `db.replicas` and `db.async_engine` still work through __getattr__ below.
+_engine = None
+_replicas = None
+_async_engine = None
+_async_sessionmaker = None
+_engine_lock = threading.Lock()
+
+def _sqlite_savepoints(engine):
+    """Open a real transaction before a SAVEPOINT on SQLite.
 
-# SQLAlchemy Database URL
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}"
+    pysqlite only issues BEGIN before DML, so a SAVEPOINT sent first starts a
+    transaction of its own and its RELEASE commits it: the session's later
+    rollback then undoes nothing. BEGIN IMMEDIATE takes the write lock up front,
+    as the savepoint is there to guard writes. Plain reads keep pysqlite's
+    behaviour, so they don't hold locks that writers would deadlock on.
+    """
+    if engine.dialect.name != "sqlite":
+        return
 
-# Create SQLAlchemy Engine
-engine = create_engine(DATABASE_URL, echo=True)
+    @event.listens_for(engine, "savepoint")
+    def _begin_before_savepoint(connection, name):
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _create_engine(url: str):
+    engine = create_engine(url, **_engine_options(url, TimedQueuePool))
+    _sqlite_savepoints(engine)
+    instrument_engine(engine)
+    return engine
+
+def get_engine():
+    "The primary engine (and the replica set), created on first use."
+    global _engine, _replicas
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _replicas = ReplicaSet([_create_engine(url) for url in DATABASE_REPLICA_URLS])
+                _engine = _create_engine(DATABASE_URL)
+    return _engine
+
+def get_replicas() -> ReplicaSet:
+    get_engine()
+    return _replicas
+
+def get_async_engine():
+    "The async engine in async mode, otherwise None."
+    global _async_engine, _async_sessionmaker
+    if DB_ASYNC and _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+                async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, TimedAsyncAdaptedQueuePool))
+                instrument_engine(async_engine.sync_engine)
+                _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+                _async_engine = async_engine
+    return _async_engine
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    if name == "replicas":
+        return get_replicas()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazyBindSession(RoutingSession):
+    "Binds to the primary engine when the session is created, building it if needed."
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
 
 # Create Session Factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=LazyBindSession, autocommit=False, autoflush=False)
 
 # Base class for ORM models
 Base = declarative_base()
 
 # Function to initialize database tables
 def init_db():
-    from .models import User, Book, BorrowRequest, BorrowHistory
-    Base.metadata.create_all(bind=engine) # Create tables if they don't exist
-    print("Tables created successfully")
+    # One stamp lookup when the schema is current; DDL only runs when it is behind (see migrations.py)
+    from .migrations import ensure_schema
+    ensure_schema(get_engine())
+    # SQLite stand-in replicas aren't fed by replication, so give them the schema too
+    for replica in get_replicas().replicas:
+        if replica.engine.dialect.name == "sqlite":
+            try:
+                ensure_schema(replica.engine)
+            except Exception as exc:
+                # Reads fall back to the primary until the replica passes a health check
+                replica.healthy, replica.error = False, str(exc)
+
+def read_session():
+    "A session that reads from a healthy replica when there is one (falls back to the primary)."
+    db = SessionLocal()
+    db.info["replica"] = get_replicas().pick()
+    return db
 
 # Dependency function to get a database session
-def get_db():
-    db = SessionLocal()  # Create a new session
+def get_db(request: Request):
+    # Read-only requests go to a replica unless this client wrote moments ago
+    if request.method in ("GET", "HEAD") and DATABASE_REPLICA_URLS and PRIMARY_COOKIE not in request.cookies:
+        db = read_session()
+    else:
+        db = SessionLocal()  # Create a new session
     try:
         yield db  # Yield session (used for dependency injection)
     finally:
-        db.close() # Close session when done
\ No newline at end of file
+        db.close() # Close session when done
+
+# Async counterpart of get_db, used by the routes in async_routes.py
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
\ No newline at end of file
@@ -1,15 +1,44 @@
+import os
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 from jwt.exceptions import InvalidTokenError
 from sqlalchemy.orm import Session 
 from . import models
-from .db import get_db
+from .db import get_db, SessionLocal
 from .models import User
 from .utils.auth import SECRET_KEY, ALGORITHM
+from .utils.cache import TTLCache
+from .utils.events import event_bus
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/token") # URL for getting token 
 
+# Authenticated user as seen by the routes; detached from any session so it can be cached
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    role: str
+
+# Resolved principals keyed by user id, so authenticated requests skip the users lookup.
+# Call revoke_principal(user_id) whenever a user is deleted or their role changes.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+event_bus.on("principal_revoked", lambda event: principal_cache.invalidate(event["user_id"]))
+
+def revoke_principal(user_id: int):
+    """Drop a cached principal in every worker once the change is committed.
+
+    Other workers only hear of it through a shared event bus (EVENT_BUS_URL);
+    without one they keep serving it for up to PRINCIPAL_CACHE_TTL seconds.
+    """
+    principal_cache.invalidate(user_id)
+    event_bus.publish({"type": "principal_revoked", "user_id": user_id})
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -18,16 +47,31 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except InvalidTokenError:
+        user_id: int = int(payload.get("sub"))
+    except (InvalidTokenError, TypeError, ValueError):
         raise credentials_exception
-    
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    # A revocation committed while we read the user must not be undone by caching what we read
+    generation = principal_cache.generation
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal(id=user.id, name=user.name, email=user.email, role=str(user.role))
+    principal_cache.set(user_id, principal, generation)
+    return principal
+
+# get_current_user for long-lived responses such as event streams: the session is
+# closed before the handler runs instead of staying checked out for the whole stream
+def get_stream_user(token: str = Depends(oauth2_scheme)):
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    finally:
+        db.close()
 
 # Dependency for librarian-only access
 def require_librarian(current_user: User = Depends(get_current_user)):
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, func, union_all
+from sqlalchemy.orm import Session
+from ..db import SessionLocal
+from ..models import BorrowHistory, BorrowHistoryArchive
+from ..schemas import BorrowHistoryResponse
+from ..utils.fastjson import projection
+from ..utils.listing import keyset, filter_borrow_query
+from .locks import job_lock
+
+logger = logging.getLogger("app.jobs.archive")
+
+# Returned loans whose end_date is older than this many days are moved to borrow_history_archive
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Seconds between background archive runs; 0 (the default) leaves archiving to the CLI
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "0"))
+
+LOCK_NAME = "lms_history_archive"
+
+ARCHIVED_COLUMNS = ["id", "user_id", "book_id", "start_date", "end_date", "status"]
+
+# Outcome of the archive runs in this process, exposed on /metrics
+archive_stats = {"runs": 0, "skipped": 0, "rows_moved": 0, "last_run_at": None, "last_rows_moved": None}
+
+def _archivable(cutoff: datetime):
+    # Reads ix_borrow_history_status_end_date
+    return (BorrowHistory.status == "returned", BorrowHistory.end_date < cutoff)
+
+def count_archivable(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS, now: datetime | None = None) -> int:
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return db.scalar(select(func.count()).select_from(BorrowHistory).where(*_archivable(now - timedelta(days=older_than_days))))
+
+def archive_history(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                    now: datetime | None = None, max_batches: int | None = None) -> int | None:
+    """Move old returned loans to the archive table. Returns rows moved, or None if another worker is archiving.
+
+    Each batch (copy, then delete by id) is its own short transaction, so the
+    hot table is never locked for long and an interrupted run loses nothing.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=older_than_days)
+
+    with job_lock(db, LOCK_NAME) as acquired:
+        if not acquired:
+            return None
+        moved = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = db.scalars(
+                select(BorrowHistory.id).where(*_archivable(cutoff)).limit(batch_size).with_for_update()
+            ).all()
+            if not ids:
+                break
+            db.execute(insert(BorrowHistoryArchive).from_select(
+                ARCHIVED_COLUMNS,
+                select(*(getattr(BorrowHistory, name) for name in ARCHIVED_COLUMNS)).where(BorrowHistory.id.in_(ids)),
+            ))
+            result = db.execute(delete(BorrowHistory).where(BorrowHistory.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            moved += result.rowcount
+            batches += 1
+        return moved
+
+def history_page(status, user_id, book_id, start_from, start_to, after: int | None, limit: int):
+    """Keyset page over borrow_history and its archive together.
+
+    Ids are unique across both tables, so each side is paged on its own index
+    and the two small pages are merged by id.
+    """
+    branches = []
+    for model in (BorrowHistory, BorrowHistoryArchive):
+        stmt = select(*projection(model, BorrowHistoryResponse)).filter(model.status.in_(["borrowed", "returned", "overdue"]))
+        stmt = filter_borrow_query(stmt, model, status, user_id, book_id, start_from, start_to)
+        branches.append(keyset(stmt, model.id, after, limit).subquery())
+    merged = union_all(*(select(*branch.c) for branch in branches)).subquery()
+    return select(*merged.c).order_by(merged.c.id).limit(limit + 1)
+
+def archived_history_export(status, user_id, book_id, start_from, start_to):
+    "Archived rows matching the history filters, in id order, for exports."
+    stmt = select(*projection(BorrowHistoryArchive, BorrowHistoryResponse))
+    stmt = filter_borrow_query(stmt, BorrowHistoryArchive, status, user_id, book_id, start_from, start_to)
+    return stmt.order_by(BorrowHistoryArchive.id)
+
+def run_archive() -> int | None:
+    "One archive run with its own session, recording the outcome in archive_stats."
+    db = SessionLocal()
+    try:
+        moved = archive_history(db)
+    finally:
+        db.close()
+    if moved is None:
+        archive_stats["skipped"] += 1
+        return None
+    archive_stats["runs"] += 1
+    archive_stats["rows_moved"] += moved
+    archive_stats["last_rows_moved"] = moved
+    archive_stats["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    if moved:
+        logger.info("Archived %d returned loans", moved)
+    return moved
+
+async def history_archiver(interval: float = ARCHIVE_INTERVAL):
+    "Background loop started from the app lifespan when ARCHIVE_INTERVAL is set."
+    while True:
+        try:
+            await asyncio.to_thread(run_archive)
+        except Exception:
+            logger.exception("History archive failed")
+        await asyncio.sleep(interval)
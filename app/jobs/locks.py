@@ -0,0 +1,31 @@
+import threading
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+_local_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+@contextmanager
+def job_lock(db: Session, name: str):
+    "Yield True if this worker may run the job `name`. On MySQL the lock is shared by every worker via GET_LOCK."
+    bind = db.get_bind()
+    if bind.dialect.name != "mysql":
+        with _registry_lock:
+            lock = _local_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    # Named locks belong to a connection, so hold a dedicated one for the whole run
+    with bind.connect() as lock_conn:
+        acquired = lock_conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock_conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
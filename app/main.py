@@ -1,23 +1,78 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from . import db
 from .db import init_db
+from .utils.utils import PasswordHasherBusy
+from .utils.instrumentation import begin_request, response_headers
+from .utils.events import event_bus
 from contextlib import asynccontextmanager
 from .routes.user_routes import router as user_router
 from .routes.book_routes import router as book_router
 from .routes.borrow_request_routes import router as borrow_request_router
 from .routes.borrow_history_routes import router as borrow_history_router
+from .routes.report_routes import router as report_router
+from .routes.metrics_routes import router as metrics_router
+from .jobs.overdue import overdue_sweeper, OVERDUE_SWEEP_INTERVAL
+from .jobs.archive import history_archiver, ARCHIVE_INTERVAL
+from .utils.recommendations import recommendation_loader, RECOMMENDATIONS_PATH
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    await event_bus.start()
+    sweeper = asyncio.create_task(overdue_sweeper()) if OVERDUE_SWEEP_INTERVAL > 0 else None
+    archiver = asyncio.create_task(history_archiver()) if ARCHIVE_INTERVAL > 0 else None
+    # Loads the artifact built by `python -m app.cli recommendations`; workers never build it
+    recommendations = asyncio.create_task(recommendation_loader()) if RECOMMENDATIONS_PATH else None
     yield
+    if sweeper is not None:
+        sweeper.cancel()
+    if archiver is not None:
+        archiver.cancel()
+    if recommendations is not None:
+        recommendations.cancel()
+    await event_bus.stop()
+    await db.dispose_async_engine()
 
 app = FastAPI(lifespan=lifespan)
 
+# Per-request SQL statement count, SQL time and pool wait, reported as response headers
+@app.middleware("http")
+async def sql_metrics_middleware(request: Request, call_next):
+    stats = begin_request()
+    response = await call_next(request)
+    response.headers.update(response_headers(stats))
+    return response
+
+# Keep a client's reads on the primary for a moment after it writes, so it sees its own changes
+@app.middleware("http")
+async def replica_stickiness_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if db.DATABASE_REPLICA_URLS and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(db.PRIMARY_COOKIE, "1", max_age=db.DB_REPLICA_STICKY_SECONDS, httponly=True, samesite="lax")
+    return response
+
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(status_code=503, content={"detail": "Too many login attempts in progress, try again shortly"}, headers={"Retry-After": "1"})
+
 # Register Routes
+if db.DB_ASYNC:
+    # Registered first so they take precedence over the sync read routes with the same paths
+    from .routes.async_routes import book_router as async_book_router
+    from .routes.async_routes import borrow_request_router as async_borrow_request_router
+    from .routes.async_routes import borrow_history_router as async_borrow_history_router
+    app.include_router(async_book_router)
+    app.include_router(async_borrow_request_router)
+    app.include_router(async_borrow_history_router)
+
 app.include_router(user_router)
 app.include_router(book_router)
 app.include_router(borrow_request_router)
 app.include_router(borrow_history_router)
+app.include_router(report_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def read_root():
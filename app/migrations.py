@@ -0,0 +1,167 @@
+"""Schema versions and the steps between them.
+
+Every database carries a schema_version stamp. Workers read it once at startup
+and only run DDL when it is behind SCHEMA_VERSION; with AUTO_MIGRATE=0 they
+refuse to start instead, and `python -m app.cli migrate` applies the steps as a
+separate deploy step.
+
+To change the schema: change the models, add a step to MIGRATIONS under the
+next number that brings an existing database to the new shape, and bump
+SCHEMA_VERSION. New databases are created from the models directly.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from sqlalchemy import delete, insert, inspect, select, text, func
+from sqlalchemy.exc import DBAPIError
+from .db import Base
+
+logger = logging.getLogger("app.migrations")
+
+# Migrate on startup when the schema is behind (convenient locally); set 0 when deploys run the CLI
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+
+LOCK_NAME = "lms_schema_migrate"
+# Seconds a worker waits for another one's migration to finish
+MIGRATE_LOCK_TIMEOUT = int(os.getenv("MIGRATE_LOCK_TIMEOUT", "300"))
+_local_lock = threading.Lock()
+
+def _baseline(conn):
+    # Creates the tables that are missing; existing tables are left as they are, so the
+    # indexes and constraints added to them since come from the steps below
+    Base.metadata.create_all(conn)
+
+def _borrow_history_archive(conn):
+    from .models import BorrowHistoryArchive
+    BorrowHistoryArchive.__table__.create(conn, checkfirst=True)
+
+def _index_names(conn, table: str) -> set[str]:
+    inspector = inspect(conn)
+    return ({index["name"] for index in inspector.get_indexes(table)}
+            | {constraint["name"] for constraint in inspector.get_unique_constraints(table)})
+
+def _create_model_indexes(conn, model, names: tuple[str, ...]):
+    existing = _index_names(conn, model.__tablename__)
+    for index in model.__table__.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(conn)
+
+def _borrow_indexes(conn):
+    from .models import BorrowRequest, BorrowHistory
+    _create_model_indexes(conn, BorrowRequest, (
+        "ix_borrow_requests_user_status", "ix_borrow_requests_status_id", "ix_borrow_requests_book_status",
+    ))
+    _create_model_indexes(conn, BorrowHistory, (
+        "ix_borrow_history_user_status", "ix_borrow_history_book_status", "ix_borrow_history_status_end_date",
+    ))
+
+def _unique_loans(conn):
+    from .models import BorrowHistory
+    if "uq_borrow_history_loan" in _index_names(conn, "borrow_history"):
+        return
+    # Approvals used to be able to record a loan twice; keep the first row of each
+    first = (
+        select(func.min(BorrowHistory.id).label("id"))
+        .group_by(BorrowHistory.user_id, BorrowHistory.book_id, BorrowHistory.start_date)
+        .subquery()  # a derived table, so MySQL allows deleting from the table it reads
+    )
+    removed = conn.execute(delete(BorrowHistory).where(BorrowHistory.id.not_in(select(first.c.id)))).rowcount
+    if removed:
+        logger.warning("removed %d duplicate borrow_history rows", removed)
+    # A unique index enforces the same rule as the model's constraint, and SQLite can't add constraints
+    conn.execute(text("CREATE UNIQUE INDEX uq_borrow_history_loan ON borrow_history (user_id, book_id, start_date)"))
+
+def _books_fulltext(conn):
+    from .models import Book
+    if conn.dialect.name == "mysql":
+        _create_model_indexes(conn, Book, ("ft_books_title_author",))
+
+def _circulation_backfill(conn):
+    # Rollup tables created for an existing database start empty
+    from sqlalchemy.orm import Session
+    from .models import BorrowHistory, BookCirculation
+    from .utils.circulation import rebuild
+    if conn.scalar(select(BookCirculation.book_id).limit(1)) is None and conn.scalar(select(BorrowHistory.id).limit(1)) is not None:
+        rebuild(Session(bind=conn))
+
+# version -> step that upgrades a database at version - 1
+# Databases from before versioning are stamped 0 and go through every step
+MIGRATIONS = {
+    1: _baseline,
+    2: _borrow_history_archive,
+    3: _borrow_indexes,
+    4: _unique_loans,
+    5: _books_fulltext,
+    6: _circulation_backfill,
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+def current_version(engine) -> int | None:
+    "The stamped schema version, or None for an unversioned database."
+    from .models import SchemaVersion
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+    except DBAPIError:
+        # No schema_version table yet
+        return None
+
+@contextmanager
+def migration_lock(engine):
+    "Serialize migrations; on MySQL across every worker via GET_LOCK."
+    if engine.dialect.name != "mysql":
+        with _local_lock:
+            yield
+        return
+    with engine.connect() as lock_conn:
+        acquired = lock_conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": MIGRATE_LOCK_TIMEOUT}
+        ).scalar() == 1
+        if not acquired:
+            raise RuntimeError("Timed out waiting for another process to finish migrating")
+        try:
+            yield
+        finally:
+            lock_conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+
+def migrate(engine, target: int = SCHEMA_VERSION) -> tuple[int | None, int]:
+    "Apply the steps up to `target`, each in its own transaction. Returns (from version, to version)."
+    from .models import SchemaVersion
+    with migration_lock(engine):
+        # Read under the lock: another worker may have just finished
+        start = current_version(engine)
+        version = start or 0
+        if start is None:
+            with engine.begin() as conn:
+                if not inspect(conn).has_table("books"):
+                    # Empty database: build the current schema and stamp it
+                    Base.metadata.create_all(conn)
+                    conn.execute(insert(SchemaVersion), [{"version": v} for v in sorted(MIGRATIONS) if v <= target])
+                    return None, target
+                # Tables from before versioning: stamp them as version 0 and apply every step
+                SchemaVersion.__table__.create(conn, checkfirst=True)
+                conn.execute(insert(SchemaVersion).values(version=0))
+        for step in sorted(MIGRATIONS):
+            if version < step <= target:
+                logger.info("migrating schema to version %d", step)
+                with engine.begin() as conn:
+                    MIGRATIONS[step](conn)
+                    conn.execute(insert(SchemaVersion).values(version=step))
+                version = step
+        return start, version
+
+def ensure_schema(engine):
+    "Startup check: a single stamp lookup when the schema is current."
+    version = current_version(engine)
+    if version == SCHEMA_VERSION:
+        return
+    if version is not None and version > SCHEMA_VERSION:
+        logger.warning("database schema version %d is newer than this code (%d)", version, SCHEMA_VERSION)
+        return
+    if not AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}; run `python -m app.cli migrate`"
+        )
+    start, end = migrate(engine)
+    print(f"Database schema migrated from version {start} to {end}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db import Base
@@ -31,6 +31,11 @@ class Book(Base):
     borrow_requests = relationship("BorrowRequest", back_populates="book")
     borrow_history = relationship("BorrowHistory", back_populates="book")
 
+    __table_args__ = (
+        # Backs GET /books/search on MySQL; other databases use the in-process index
+        Index("ft_books_title_author", "title", "author", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
 # Borrow Requests Table
 class BorrowRequest(Base):
     __tablename__ = "borrow_requests"
@@ -45,6 +50,12 @@ class BorrowRequest(Base):
     user = relationship("User", back_populates="borrow_requests")
     book = relationship("Book", back_populates="borrow_requests")
 
+    __table_args__ = (
+        Index("ix_borrow_requests_user_status", "user_id", "status"),  # /borrow-requests/me
+        Index("ix_borrow_requests_status_id", "status", "id"),  # librarian queue by status, keyset on id
+        Index("ix_borrow_requests_book_status", "book_id", "status"),
+    )
+
 # Borrow History Table
 class BorrowHistory(Base):
     __tablename__ = "borrow_history"
@@ -59,4 +70,69 @@ class BorrowHistory(Base):
     user = relationship("User", back_populates="borrow_history")
     book = relationship("Book", back_populates="borrow_history")
 
-    
\ No newline at end of file
+    __table_args__ = (
+        # One history row per loan; also serves per-user lookups through its user_id prefix
+        UniqueConstraint("user_id", "book_id", "start_date", name="uq_borrow_history_loan"),
+        Index("ix_borrow_history_user_status", "user_id", "status"),
+        Index("ix_borrow_history_book_status", "book_id", "status"),
+        Index("ix_borrow_history_status_end_date", "status", "end_date"),  # overdue sweep
+    )
+
+# Returned loans moved out of borrow_history by app/jobs/archive.py; ids are kept, so they never clash
+class BorrowHistoryArchive(Base):
+    __tablename__ = "borrow_history_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=True)
+    status = Column(Enum("borrowed", "returned", "overdue", name="history_status"), nullable=False)
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_borrow_history_archive_user_id", "user_id", "id"),
+        Index("ix_borrow_history_archive_book_id", "book_id", "id"),
+    )
+
+# Circulation rollups, maintained incrementally by app/utils/circulation.py
+class BookCirculation(Base):
+    __tablename__ = "book_circulation"
+
+    book_id = Column(Integer, primary_key=True, autoincrement=False)
+    total_loans = Column(Integer, default=0, nullable=False)
+    active_loans = Column(Integer, default=0, nullable=False)  # borrowed or overdue right now
+    overdue_loans = Column(Integer, default=0, nullable=False)  # overdue right now
+    total_overdues = Column(Integer, default=0, nullable=False)  # loans that ever went overdue
+
+    __table_args__ = (
+        Index("ix_book_circulation_total_loans", "total_loans"),
+    )
+
+class UserCirculation(Base):
+    __tablename__ = "user_circulation"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    total_loans = Column(Integer, default=0, nullable=False)
+    active_loans = Column(Integer, default=0, nullable=False)
+    overdue_loans = Column(Integer, default=0, nullable=False)
+    total_overdues = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_user_circulation_active_loans", "active_loans"),
+    )
+
+class MonthlyCirculation(Base):
+    __tablename__ = "monthly_circulation"
+
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    loans = Column(Integer, default=0, nullable=False)  # by loan start month
+    returns = Column(Integer, default=0, nullable=False)
+    overdues = Column(Integer, default=0, nullable=False)
+
+# Applied schema versions, one row per migration (see migrations.py)
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime, server_default=func.now(), nullable=False)
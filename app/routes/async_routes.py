@@ -0,0 +1,132 @@
+# Async versions of the hot read routes, mounted ahead of the sync routers when DB_ASYNC=1.
+# Each handler awaits the database instead of holding a threadpool thread; writes stay on the sync routers.
+from datetime import date
+from typing import Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_async_db
+from ..models import Book, BorrowRequest, BorrowHistory, User
+from ..schemas import BookResponse, BorrowRequestResponse, BorrowRequestExpanded, BorrowHistoryResponse, BorrowHistoryExpanded
+from ..dependencies import require_user, require_librarian
+from ..utils.listing import keyset, split_page, filter_borrow_query, NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fastjson import projection, render_rows
+from ..utils.expand import parse_expand, aexpanded_page
+from ..utils.response_cache import catalog_cache, request_key, conditional_response
+from .book_routes import book_adapter
+from ..jobs.archive import history_page
+
+book_router = APIRouter(prefix="/books", tags=["Books"])
+borrow_request_router = APIRouter(prefix="/borrow-requests", tags=["Borrow Requests"])
+borrow_history_router = APIRouter(prefix="/borrow-history", tags=["Borrow History"])
+
+HistoryStatus = Literal["borrowed", "returned", "overdue"]
+
+# Get All Books
+@book_router.get("/", response_model=list[BookResponse])
+async def get_books(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    author: Optional[str] = None,
+    available: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def render():
+        stmt = select(*projection(Book, BookResponse))
+        if author is not None:
+            stmt = stmt.filter(Book.author == author)
+        if available is not None:
+            stmt = stmt.filter(Book.available_copies > 0 if available else Book.available_copies <= 0)
+        rows, next_cursor = split_page(await db.execute(keyset(stmt, Book.id, after, limit)), limit)
+        headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+        return render_rows(rows, BookResponse), headers
+
+    return conditional_response(request, await catalog_cache.aget_or_compute(request_key(request), render))
+
+# Get Book by ID (int-only path so /books/search still reaches the sync router)
+@book_router.get("/{book_id:int}", response_model=BookResponse)
+async def get_book(book_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def render():
+        book = await db.get(Book, book_id)
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return book_adapter.dump_json(book_adapter.validate_python(book, from_attributes=True)), {}
+
+    return conditional_response(request, await catalog_cache.aget_or_compute(request_key(request), render))
+
+# Get All Borrow Requests librarian
+@borrow_request_router.get("/", response_model=list[BorrowRequestExpanded])
+async def get_borrow_requests(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[Literal["pending", "approved", "denied"]] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: AsyncSession = Depends(get_async_db),
+    _: User = Depends(require_librarian),
+):
+    stmt = filter_borrow_query(select(*projection(BorrowRequest, BorrowRequestResponse)), BorrowRequest, status, user_id, book_id, start_from, start_to)
+    rows = await db.execute(keyset(stmt, BorrowRequest.id, after, limit))
+    return await aexpanded_page(db, BorrowRequest, rows, limit, BorrowRequestResponse, expand)
+
+# Get All Borrow Requests User only
+@borrow_request_router.get("/me", response_model=list[BorrowRequestExpanded])
+async def get_my_borrow_requests(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[Literal["pending", "approved", "denied"]] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_user),
+):
+    stmt = filter_borrow_query(select(*projection(BorrowRequest, BorrowRequestResponse)), BorrowRequest, status, current_user.id, book_id, start_from, start_to)
+    rows = await db.execute(keyset(stmt, BorrowRequest.id, after, limit))
+    return await aexpanded_page(db, BorrowRequest, rows, limit, BorrowRequestResponse, expand)
+
+#Get all borrow history record for user
+@borrow_history_router.get("/me", response_model=list[BorrowHistoryExpanded])
+async def get_my_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[HistoryStatus] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_user),
+):
+    stmt = select(*projection(BorrowHistory, BorrowHistoryResponse)).filter(BorrowHistory.status.in_(["borrowed", "returned", "overdue"]))
+    stmt = filter_borrow_query(stmt, BorrowHistory, status, current_user.id, book_id, start_from, start_to)
+    rows = await db.execute(keyset(stmt, BorrowHistory.id, after, limit))
+    return await aexpanded_page(db, BorrowHistory, rows, limit, BorrowHistoryResponse, expand)
+
+# Get All Borrow History Records
+@borrow_history_router.get("/", response_model=list[BorrowHistoryExpanded])
+async def get_all_borrow_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[HistoryStatus] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    include_archived: bool = False,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: AsyncSession = Depends(get_async_db),
+    _: User = Depends(require_librarian),
+):
+    if include_archived:
+        rows = await db.execute(history_page(status, user_id, book_id, start_from, start_to, after, limit))
+        return await aexpanded_page(db, BorrowHistory, rows, limit, BorrowHistoryResponse, expand)
+    stmt = select(*projection(BorrowHistory, BorrowHistoryResponse)).filter(BorrowHistory.status.in_(["borrowed", "returned", "overdue"]))
+    stmt = filter_borrow_query(stmt, BorrowHistory, status, user_id, book_id, start_from, start_to)
+    rows = await db.execute(keyset(stmt, BorrowHistory.id, after, limit))
+    return await aexpanded_page(db, BorrowHistory, rows, limit, BorrowHistoryResponse, expand)
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, timedelta
+from typing import Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from ..db import get_db
 from ..models import Book, User
-from ..schemas import BookCreate, BookResponse
+from ..schemas import BookCreate, BookResponse, BulkImportResponse, BookAvailabilityResponse, RecommendedBook
 from ..dependencies import require_librarian
+from ..utils.listing import keyset, split_page, NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fastjson import projection, render_rows
+from ..utils.response_cache import catalog_cache, request_key, conditional_response
+from ..utils.replicas import use_primary
+from ..utils.search import catalog_index, search_books
+from ..utils.bulk_import import import_books
+from ..utils.availability import book_calendar, MAX_WINDOW_DAYS
+from ..utils.recommendations import recommender, load_books, RecommendationsNotReady
 
 router = APIRouter(prefix="/books", tags=["Books"])
 
+book_adapter = TypeAdapter(BookResponse)
+
 # Create a Book
 @router.post("/", response_model=BookResponse)
 def create_book(book: BookCreate, db: Session = Depends(get_db), _: User = Depends(require_librarian)):
@@ -14,20 +27,108 @@ def create_book(book: BookCreate, db: Session = Depends(get_db), _: User = Depen
     db.add(new_book)
     db.commit()
     db.refresh(new_book)
+    catalog_index.add(new_book)
+    catalog_cache.bump()
     return new_book
 
+# Bulk import books from a streamed CSV (with header) or NDJSON body, upserting on ISBN
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_books(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_librarian),
+):
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            format = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+
+    report = await import_books(db, request.stream(), format, batch_size)
+    # Rebuilt lazily on the next search rather than re-indexing row by row
+    catalog_index.clear()
+    catalog_cache.bump()
+    return report
+
 # Get All Books
 @router.get("/", response_model=list[BookResponse])
-def get_books(db: Session = Depends(get_db)):
-    return db.query(Book).all()
+def get_books(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    author: Optional[str] = None,
+    available: Optional[bool] = None,
+    db: Session = Depends(get_db),
+):
+    def render():
+        use_primary(db)
+        query = db.query(*projection(Book, BookResponse))
+        if author is not None:
+            query = query.filter(Book.author == author)
+        if available is not None:
+            query = query.filter(Book.available_copies > 0 if available else Book.available_copies <= 0)
+        rows, next_cursor = split_page(keyset(query, Book.id, after, limit).all(), limit)
+        headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+        return render_rows(rows, BookResponse), headers
+
+    # Served from the versioned catalog cache; 304 when the client's ETag is current
+    return conditional_response(request, catalog_cache.get_or_compute(request_key(request), render))
+
+# Search Books by title, author or exact ISBN
+@router.get("/search", response_model=list[BookResponse])
+def search_catalog(q: str = Query(..., min_length=1, max_length=255), limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    return search_books(db, q, limit)
 
 # Get Book by ID
 @router.get("/{book_id}", response_model=BookResponse)
-def get_book(book_id: int, db: Session = Depends(get_db)):
+def get_book(book_id: int, request: Request, db: Session = Depends(get_db)):
+    def render():
+        use_primary(db)
+        book = db.query(Book).filter(Book.id == book_id).first()
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return book_adapter.dump_json(book_adapter.validate_python(book, from_attributes=True)), {}
+
+    return conditional_response(request, catalog_cache.get_or_compute(request_key(request), render))
+
+# Free copies per day over a date window
+@router.get("/{book_id}/availability", response_model=BookAvailabilityResponse)
+def get_book_availability(
+    book_id: int,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+):
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {MAX_WINDOW_DAYS} days")
+
     book = db.query(Book).filter(Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+
+    free = book_calendar(db, book, from_date, to_date)
+    return {
+        "book_id": book_id,
+        "days": [{"day": from_date + timedelta(days=offset), "free_copies": count} for offset, count in enumerate(free)],
+    }
+
+# "Readers also borrowed": served from the in-memory model, never from borrow history
+@router.get("/{book_id}/related", response_model=list[RecommendedBook])
+def get_related_books(book_id: int, limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    if db.get(Book, book_id) is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    try:
+        related = recommender.related(book_id, limit)
+    except RecommendationsNotReady:
+        raise HTTPException(status_code=503, detail="Recommendations are not available yet", headers={"Retry-After": "5"})
+    return load_books(db, related)
 
 # Update Book (e.g., Update available copies)
 @router.put("/{book_id}", response_model=BookResponse)
@@ -41,6 +142,8 @@ def update_book(book_id: int, book_update: BookCreate, db: Session = Depends(get
 
     db.commit()
     db.refresh(book)
+    catalog_index.add(book)
+    catalog_cache.bump()
     return book
 
 # Delete Book
@@ -52,4 +155,6 @@ def delete_book(book_id: int, db: Session = Depends(get_db), _: User = Depends(r
 
     db.delete(book)
     db.commit()
+    catalog_index.remove(book_id)
+    catalog_cache.bump()
     return {"message": "Book deleted successfully"}
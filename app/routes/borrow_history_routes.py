@@ -1,38 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from ..db import get_db
-from ..models import BorrowHistory, User
-from ..schemas import BorrowHistoryResponse
+from ..models import BorrowHistory, Book, User
+from ..schemas import BorrowHistoryResponse, BorrowHistoryExpanded
 from ..dependencies import require_librarian, get_current_user, require_user
+from ..utils.listing import keyset, filter_borrow_query, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fastjson import projection
+from ..utils.expand import parse_expand, expanded_page
+from ..utils.export import ExportFormat, export_response
+from ..utils.circulation import record_return
+from ..utils.response_cache import catalog_cache
+from ..jobs.archive import history_page, archived_history_export
 
 
 router = APIRouter(prefix="/borrow-history", tags=["Borrow History"])
 
+HistoryStatus = Literal["borrowed", "returned", "overdue"]
+
 #Get all borrow history record for user
-@router.get("/me", response_model=list[BorrowHistoryResponse])
-def get_my_history(db: Session = Depends(get_db), current_user: User = Depends(require_user)):
-    return db.query(BorrowHistory).filter(
-        BorrowHistory.user_id == current_user.id,
+@router.get("/me", response_model=list[BorrowHistoryExpanded])
+def get_my_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[HistoryStatus] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_user),
+):
+    query = db.query(*projection(BorrowHistory, BorrowHistoryResponse)).filter(
         BorrowHistory.status.in_(["borrowed", "returned", "overdue"])
-    ).all()
+    )
+    query = filter_borrow_query(query, BorrowHistory, status, current_user.id, book_id, start_from, start_to)
+    return expanded_page(db, BorrowHistory, keyset(query, BorrowHistory.id, after, limit).all(), limit, BorrowHistoryResponse, expand)
 
 # Get All Borrow History Records
-@router.get("/", response_model=list[BorrowHistoryResponse])
-def get_all_borrow_history(db: Session = Depends(get_db), _: User = Depends(require_librarian)):
-    return db.query(BorrowHistory).filter(
+@router.get("/", response_model=list[BorrowHistoryExpanded])
+def get_all_borrow_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[HistoryStatus] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    include_archived: bool = False,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_librarian),
+):
+    if include_archived:
+        rows = db.execute(history_page(status, user_id, book_id, start_from, start_to, after, limit)).all()
+        return expanded_page(db, BorrowHistory, rows, limit, BorrowHistoryResponse, expand)
+    query = db.query(*projection(BorrowHistory, BorrowHistoryResponse)).filter(
         BorrowHistory.status.in_(["borrowed", "returned", "overdue"])
-    ).all()
+    )
+    query = filter_borrow_query(query, BorrowHistory, status, user_id, book_id, start_from, start_to)
+    return expanded_page(db, BorrowHistory, keyset(query, BorrowHistory.id, after, limit).all(), limit, BorrowHistoryResponse, expand)
 
+# Export Borrow History as CSV or NDJSON
+@router.get("/export")
+def export_borrow_history(
+    format: ExportFormat = "csv",
+    status: Optional[HistoryStatus] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    include_archived: bool = False,
+    _: User = Depends(require_librarian),
+):
+    stmt = select(*projection(BorrowHistory, BorrowHistoryResponse)).filter(
+        BorrowHistory.status.in_(["borrowed", "returned", "overdue"])
+    )
+    stmt = filter_borrow_query(stmt, BorrowHistory, status, user_id, book_id, start_from, start_to)
+    statements = [stmt.order_by(BorrowHistory.id)]
+    if include_archived:
+        # Archived loans are the oldest, so they go first
+        statements.insert(0, archived_history_export(status, user_id, book_id, start_from, start_to))
+    return export_response(statements, BorrowHistoryResponse, format, "borrow-history")
 
 # Get Borrow History by User ID
-@router.get("/user/{user_id}", response_model=list[BorrowHistoryResponse])
-def get_borrow_history_by_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_librarian)):
+@router.get("/user/{user_id}", response_model=list[BorrowHistoryExpanded])
+def get_borrow_history_by_user(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[HistoryStatus] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    include_archived: bool = False,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_librarian),
+):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return db.query(BorrowHistory).filter(
-        BorrowHistory.user_id == user_id,
+    if include_archived:
+        rows = db.execute(history_page(status, user_id, book_id, start_from, start_to, after, limit)).all()
+        return expanded_page(db, BorrowHistory, rows, limit, BorrowHistoryResponse, expand)
+    query = db.query(*projection(BorrowHistory, BorrowHistoryResponse)).filter(
         BorrowHistory.status.in_(["borrowed", "returned", "overdue"])
-    ).all()
+    )
+    query = filter_borrow_query(query, BorrowHistory, status, user_id, book_id, start_from, start_to)
+    return expanded_page(db, BorrowHistory, keyset(query, BorrowHistory.id, after, limit).all(), limit, BorrowHistoryResponse, expand)
+
+# Mark a loan as returned and put the copy back in stock
+@router.put("/{history_id}/return", response_model=BorrowHistoryResponse)
+def return_borrowed_book(history_id: int, db: Session = Depends(get_db), _: User = Depends(require_librarian)):
+    history = db.query(BorrowHistory).filter(BorrowHistory.id == history_id).with_for_update().first()
+    if not history:
+        raise HTTPException(status_code=404, detail="Borrow history not found")
+    if history.status not in ("borrowed", "overdue"):
+        raise HTTPException(status_code=409, detail=f"Loan is already {history.status}")
 
+    was_overdue = history.status == "overdue"
+    history.status = "returned"
+    db.execute(
+        update(Book)
+        .where(Book.id == history.book_id)
+        .values(available_copies=Book.available_copies + 1)
+        .execution_options(synchronize_session=False)
+    )
+    record_return(db, history.user_id, history.book_id, was_overdue)
+    db.commit()
+    catalog_cache.bump()  # available_copies changed
+    db.refresh(history)
+    return history
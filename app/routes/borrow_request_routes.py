@@ -1,21 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import os
+from datetime import date
+from typing import Optional, Literal
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from ..db import get_db
-from ..models import BorrowRequest, User, Book, BorrowHistory
-from ..schemas import BorrowRequestCreate, BorrowRequestResponse
-from ..dependencies import require_user, require_librarian
+from ..models import BorrowRequest, User, Book, BorrowHistory, BorrowHistoryArchive
+from ..schemas import BorrowRequestCreate, BorrowRequestResponse, BorrowRequestExpanded, BorrowDecision, BorrowDecisionResult
+from ..dependencies import require_user, require_librarian, get_stream_user
+from ..utils.availability import book_calendar, MAX_WINDOW_DAYS
+from ..utils.circulation import record_loan
+from ..utils.response_cache import catalog_cache
+from ..utils.listing import keyset, filter_borrow_query, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fastjson import projection
+from ..utils.expand import parse_expand, expanded_page
+from ..utils.export import ExportFormat, export_response
+from ..utils.events import event_bus
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_KEEPALIVE = float(os.getenv("EVENT_KEEPALIVE", "15"))
 
 router = APIRouter(prefix="/borrow-requests", tags=["Borrow Requests"])
 
+def change_event(kind: str, borrow_request: BorrowRequest) -> dict:
+    "Event for a create/update/delete; publish it with event_bus.publish once the change is committed."
+    return {
+        "type": kind,
+        "user_id": borrow_request.user_id,
+        "request": BorrowRequestResponse.model_validate(borrow_request, from_attributes=True).model_dump(mode="json"),
+    }
+
 # Create a Borrow Request
 @router.post("/", response_model=BorrowRequestResponse)
 def create_borrow_request(request: BorrowRequestCreate, db: Session = Depends(get_db), current_user: User = Depends(require_user)):
 
+    if request.end_date < request.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (request.end_date - request.start_date).days >= MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Loans are limited to {MAX_WINDOW_DAYS} days")
+
     # Check if book exists
     book = db.query(Book).filter(Book.id == request.book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    # Reject up front when approved loans already take every copy on some day of the window
+    if min(book_calendar(db, book, request.start_date, request.end_date)) < 1:
+        raise HTTPException(status_code=409, detail="No copies available for the requested dates")
+
     # Create a new borrow request with logged-in user ID
     borrow_request = BorrowRequest(
         user_id=current_user.id,
@@ -26,17 +62,75 @@ def create_borrow_request(request: BorrowRequestCreate, db: Session = Depends(ge
     db.add(borrow_request)
     db.commit()
     db.refresh(borrow_request)
+    event_bus.publish(change_event("created", borrow_request))
     return borrow_request
 
 # Get All Borrow Requests librarian
-@router.get("/", response_model=list[BorrowRequestResponse])
-def get_borrow_requests(db: Session = Depends(get_db), _: User = Depends(require_librarian)):
-    return db.query(BorrowRequest).all()
+@router.get("/", response_model=list[BorrowRequestExpanded])
+def get_borrow_requests(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[Literal["pending", "approved", "denied"]] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_librarian),
+):
+    query = filter_borrow_query(db.query(*projection(BorrowRequest, BorrowRequestResponse)), BorrowRequest, status, user_id, book_id, start_from, start_to)
+    return expanded_page(db, BorrowRequest, keyset(query, BorrowRequest.id, after, limit).all(), limit, BorrowRequestResponse, expand)
 
 # Get All Borrow Requests User only 
-@router.get("/me", response_model=list[BorrowRequestResponse])
-def get_my_borrow_requests(db: Session = Depends(get_db), current_user: User = Depends(require_user)):
-    return db.query(BorrowRequest).filter(BorrowRequest.user_id == current_user.id).all()
+@router.get("/me", response_model=list[BorrowRequestExpanded])
+def get_my_borrow_requests(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    status: Optional[Literal["pending", "approved", "denied"]] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    expand: tuple[str, ...] = Depends(parse_expand),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_user),
+):
+    query = filter_borrow_query(db.query(*projection(BorrowRequest, BorrowRequestResponse)), BorrowRequest, status, current_user.id, book_id, start_from, start_to)
+    return expanded_page(db, BorrowRequest, keyset(query, BorrowRequest.id, after, limit).all(), limit, BorrowRequestResponse, expand)
+
+# Export Borrow Requests as CSV or NDJSON (declared before /{request_id})
+@router.get("/export")
+def export_borrow_requests(
+    format: ExportFormat = "csv",
+    status: Optional[Literal["pending", "approved", "denied"]] = None,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    _: User = Depends(require_librarian),
+):
+    stmt = filter_borrow_query(select(*projection(BorrowRequest, BorrowRequestResponse)), BorrowRequest, status, user_id, book_id, start_from, start_to)
+    return export_response([stmt.order_by(BorrowRequest.id)], BorrowRequestResponse, format, "borrow-requests")
+
+# Server-Sent Events for borrow request changes: librarians see every request, users their own
+@router.get("/events")
+async def borrow_request_events(request: Request, current_user: User = Depends(get_stream_user)):
+    subscription = event_bus.subscribe(None if current_user.role == "librarian" else current_user.id)
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event.get("request")) + b"\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # Get Borrow Request by ID
 @router.get("/{request_id}", response_model=BorrowRequestResponse)
@@ -46,41 +140,130 @@ def get_borrow_request(request_id: int, db: Session = Depends(get_db), _: User =
         raise HTTPException(status_code=404, detail="Borrow request not found")
     return borrow_request
 
+class DecisionError(Exception):
+    "A status change that can't be applied; carries the HTTP status to report."
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _apply_decision(db: Session, borrow_request: BorrowRequest, status: str):
+    "Change a request's status inside the caller's transaction, keeping stock and history in step."
+    previous = borrow_request.status
+    if status == previous:
+        return
+
+    if status == "approved":
+        # Conditional decrement first, so concurrent approvals can never take more copies than exist
+        result = db.execute(
+            update(Book)
+            .where(Book.id == borrow_request.book_id, Book.available_copies > 0)
+            .values(available_copies=Book.available_copies - 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise DecisionError(409, "No copies available")
+        db.add(BorrowHistory(
+            user_id=borrow_request.user_id,
+            book_id=borrow_request.book_id,
+            start_date=borrow_request.start_date,
+            end_date=borrow_request.end_date,
+            status="borrowed"
+        ))
+        try:
+            db.flush()
+        except IntegrityError:
+            # uq_borrow_history_loan: this loan is already recorded; the caller rolls back the decrement
+            raise DecisionError(409, "Loan is already recorded")
+        record_loan(db, borrow_request.user_id, borrow_request.book_id, borrow_request.start_date)
+
+    elif previous == "approved":
+        # Withdrawing an approval gives the copy back, but only while the loan hasn't moved on
+        history = db.query(BorrowHistory).filter(
+            BorrowHistory.user_id == borrow_request.user_id,
+            BorrowHistory.book_id == borrow_request.book_id,
+            BorrowHistory.start_date == borrow_request.start_date
+        ).first()
+        if history is not None and history.status != "borrowed":
+            raise DecisionError(409, f"Loan is already {history.status}")
+        if history is None and db.query(BorrowHistoryArchive.id).filter(
+            BorrowHistoryArchive.user_id == borrow_request.user_id,
+            BorrowHistoryArchive.book_id == borrow_request.book_id,
+            BorrowHistoryArchive.start_date == borrow_request.start_date
+        ).first() is not None:
+            # Archived loans were returned long ago; their copy is already back
+            raise DecisionError(409, "Loan is already returned")
+        if history is not None:
+            db.delete(history)
+            record_loan(db, history.user_id, history.book_id, history.start_date, count=-1)
+        db.execute(
+            update(Book)
+            .where(Book.id == borrow_request.book_id)
+            .values(available_copies=Book.available_copies + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    borrow_request.status = status
+
 # Update Borrow Request Status (Approve/Deny)
 @router.put("/{request_id}", response_model=BorrowRequestResponse)
 def update_borrow_request(request_id: int, status: str, db: Session = Depends(get_db), _: User = Depends(require_librarian)):
-    borrow_request = db.query(BorrowRequest).filter(BorrowRequest.id == request_id).first()
+    # Row lock so two librarians deciding the same request are serialized
+    borrow_request = db.query(BorrowRequest).filter(BorrowRequest.id == request_id).with_for_update().first()
     if not borrow_request:
         raise HTTPException(status_code=404, detail="Borrow request not found")
 
     if status not in ["pending", "approved", "denied"]:
         raise HTTPException(status_code=400, detail="Invalid status value")
 
-    borrow_request.status = status
+    try:
+        _apply_decision(db, borrow_request, status)
+    except DecisionError as exc:
+        db.rollback()
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+    # Status, stock and history are committed together
     db.commit()
+    catalog_cache.bump()  # available_copies may have changed
     db.refresh(borrow_request)
+    event_bus.publish(change_event("updated", borrow_request))
+    return borrow_request
 
-    # Insert into borrowHistory if approved
-    if status == "approved":
-        # Check if already added in history (prevent duplicates if route called twice)
-        existing_history = db.query(BorrowHistory).filter(
-            BorrowHistory.user_id == borrow_request.user_id,
-            BorrowHistory.book_id == borrow_request.book_id,
-            BorrowHistory.start_date == borrow_request.start_date
-        ).first()
+# Approve or deny many borrow requests in one transaction
+@router.post("/approve", response_model=list[BorrowDecisionResult])
+def decide_borrow_requests(decision: BorrowDecision, db: Session = Depends(get_db), _: User = Depends(require_librarian)):
+    # Lock in id order so overlapping batches can't deadlock
+    requests = {
+        borrow_request.id: borrow_request
+        for borrow_request in db.query(BorrowRequest)
+        .filter(BorrowRequest.id.in_(decision.request_ids))
+        .order_by(BorrowRequest.id)
+        .with_for_update()
+    }
 
-        if not existing_history:
-            history_entry = BorrowHistory(
-                user_id=borrow_request.user_id,
-                book_id=borrow_request.book_id,
-                start_date=borrow_request.start_date,
-                end_date=borrow_request.end_date,
-                status="borrowed"
-            )
-            db.add(history_entry)
-            db.commit()
+    results = []
+    for request_id in decision.request_ids:
+        borrow_request = requests.get(request_id)
+        if borrow_request is None:
+            results.append(BorrowDecisionResult(id=request_id, ok=False, detail="Borrow request not found"))
+            continue
+        try:
+            # Savepoint per request, so one failure doesn't undo the rest of the batch
+            with db.begin_nested():
+                _apply_decision(db, borrow_request, decision.status)
+        except DecisionError as exc:
+            results.append(BorrowDecisionResult(id=request_id, ok=False, status=borrow_request.status, detail=exc.detail))
+            continue
+        results.append(BorrowDecisionResult(id=request_id, ok=True, status=decision.status))
 
-    return borrow_request
+    # Built before commit expires the instances
+    events = [change_event("updated", requests[result.id]) for result in results if result.ok]
+    db.commit()
+    catalog_cache.bump()
+    for event in events:
+        event_bus.publish(event)
+    return results
 
 # Delete Borrow Request
 @router.delete("/{request_id}")
@@ -89,6 +272,8 @@ def delete_borrow_request(request_id: int, db: Session = Depends(get_db), _: Use
     if not borrow_request:
         raise HTTPException(status_code=404, detail="Borrow request not found")
 
+    event = change_event("deleted", borrow_request)
     db.delete(borrow_request)
     db.commit()
+    event_bus.publish(event)
     return {"message": "Borrow request deleted successfully"}
@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+from .. import db
+from ..dependencies import principal_cache
+from ..utils.instrumentation import totals, pool_status
+from ..jobs.overdue import sweep_stats
+from ..jobs.archive import archive_stats
+from ..utils.response_cache import catalog_cache
+from ..utils.events import event_bus
+from ..utils.recommendations import recommender
+
+router = APIRouter(tags=["Metrics"])
+
+# Process-wide SQL, pool and cache counters for this worker
+@router.get("/metrics")
+def get_metrics():
+    metrics = {
+        "sql": totals.snapshot(),
+        "pool": pool_status(db.engine),
+        "principal_cache": principal_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "overdue_sweep": dict(sweep_stats),
+        "history_archive": dict(archive_stats),
+        "events": event_bus.stats(),
+        "recommendations": recommender.stats(),
+    }
+    if db.DATABASE_REPLICA_URLS:
+        metrics["replicas"] = db.replicas.status()
+    if db.async_engine is not None:
+        metrics["async_pool"] = pool_status(db.async_engine.sync_engine)
+    return metrics
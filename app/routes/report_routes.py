@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..db import get_db
+from ..models import Book, User, BookCirculation, UserCirculation, MonthlyCirculation
+from ..schemas import TopBookEntry, UserLoanEntry, MonthlyCirculationEntry, OverdueRateResponse
+from ..dependencies import require_librarian
+
+# All reports read the circulation rollups, never the full history table
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# Most borrowed books
+@router.get("/top-books", response_model=list[TopBookEntry])
+def get_top_books(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db), _: User = Depends(require_librarian)):
+    rows = db.query(
+        BookCirculation.book_id, Book.title, Book.author, BookCirculation.total_loans, BookCirculation.active_loans
+    ).join(Book, Book.id == BookCirculation.book_id).order_by(BookCirculation.total_loans.desc()).limit(limit)
+    return [row._asdict() for row in rows]
+
+# Users with the most books out right now
+@router.get("/active-loans", response_model=list[UserLoanEntry])
+def get_active_loans(limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db), _: User = Depends(require_librarian)):
+    rows = db.query(
+        UserCirculation.user_id, User.name, UserCirculation.active_loans, UserCirculation.total_loans, UserCirculation.overdue_loans
+    ).join(User, User.id == UserCirculation.user_id).filter(
+        UserCirculation.active_loans > 0
+    ).order_by(UserCirculation.active_loans.desc()).limit(limit)
+    return [row._asdict() for row in rows]
+
+# Loans, returns and overdues per month (months as YYYY-MM, inclusive)
+@router.get("/monthly", response_model=list[MonthlyCirculationEntry])
+def get_monthly_circulation(
+    from_month: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_librarian),
+):
+    query = db.query(MonthlyCirculation)
+    if from_month is not None:
+        query = query.filter(MonthlyCirculation.month >= from_month)
+    if to_month is not None:
+        query = query.filter(MonthlyCirculation.month <= to_month)
+    return [
+        {"month": row.month, "loans": row.loans, "returns": row.returns, "overdues": row.overdues}
+        for row in query.order_by(MonthlyCirculation.month)
+    ]
+
+# Share of loans that went overdue
+@router.get("/overdue-rate", response_model=OverdueRateResponse)
+def get_overdue_rate(db: Session = Depends(get_db), _: User = Depends(require_librarian)):
+    loans, overdues = db.query(
+        func.coalesce(func.sum(MonthlyCirculation.loans), 0), func.coalesce(func.sum(MonthlyCirculation.overdues), 0)
+    ).one()
+    currently_overdue = db.query(func.coalesce(func.sum(BookCirculation.overdue_loans), 0)).scalar()
+    return {
+        "loans": loans,
+        "overdues": overdues,
+        "overdue_rate": round(overdues / loans, 4) if loans else 0.0,
+        "currently_overdue": currently_overdue,
+    }
@@ -1,43 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from typing import Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from ..db import get_db
 from ..models import User
-from ..schemas import UserCreate, UserResponse, UserLogin, TokenResponse
+from ..schemas import UserCreate, UserResponse, UserLogin, TokenResponse, RecommendedBook
 from ..utils.utils import hash_password
 from ..utils.auth import create_access_token
-from ..utils.utils import verify_password
-from ..dependencies import get_current_user, require_librarian
+from ..utils.utils import verify_and_update_password
+from ..dependencies import get_current_user, require_librarian, revoke_principal
+from ..utils.listing import keyset, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fastjson import projection, page_response
+from ..utils.recommendations import recommender, load_books, RecommendationsNotReady
 
 router = APIRouter(prefix="/user", tags=["Users"])
 
+# The login and sign-up routes are async so they await bcrypt without holding a threadpool
+# thread; their short database calls still run in the threadpool
+def _user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+def _save(db: Session, user: User) -> User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
 # Get Current User (requires authentication)
 @router.get("/me", response_model = UserResponse)
 def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
+# Books the current user may like, from what they and similar readers borrowed
+@router.get("/me/recommendations", response_model=list[RecommendedBook])
+def get_my_recommendations(limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    try:
+        recommended = recommender.for_user(current_user.id, limit)
+    except RecommendationsNotReady:
+        raise HTTPException(status_code=503, detail="Recommendations are not available yet", headers={"Retry-After": "5"})
+    return load_books(db, recommended)
+
 # OAuth2 /token route for Swagger UI
 @router.post("/token", response_model=TokenResponse)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_user_by_email, db, form_data.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    if not verify_password(form_data.password, str(user.password)):
+    verified, new_hash = await verify_and_update_password(form_data.password, str(user.password))
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        user.password = new_hash
+        await run_in_threadpool(db.commit)
 
     access_token = create_access_token({"sub": str(user.id), "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # User Login Route
 @router.post("/login", response_model= TokenResponse) 
-def login(user: UserLogin,db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def login(user: UserLogin,db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_user_by_email, db, user.email)
     if not db_user:
         raise HTTPException(status_code=401, detail= "Invalid email or password")
     
-    if not verify_password(user.password, str(db_user.password)):
+    verified, new_hash = await verify_and_update_password(user.password, str(db_user.password))
+    if not verified:
         raise HTTPException(status_code=401, detail= "Invalid email or password")
+    if new_hash:
+        db_user.password = new_hash
+        await run_in_threadpool(db.commit)
     
     access_token = create_access_token({"user_id": db_user.id, "role": db_user.role})
 
@@ -46,13 +79,13 @@ def login(user: UserLogin,db: Session = Depends(get_db)):
 
 # Create User
 @router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+    existing_user = await run_in_threadpool(_user_by_email, db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already exists")
 
     # Hash the password before storing it
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
 
     # Create new user
     new_user = User(
@@ -61,15 +94,22 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         password = hashed_password,
         role = user.role
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    return await run_in_threadpool(_save, db, new_user)
 
 # Get All Users
 @router.get("/", response_model=list[UserResponse])
-def get_users(db: Session = Depends(get_db), _: User = Depends(require_librarian)):
-    return db.query(User).all()
+def get_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    role: Optional[Literal["user", "librarian"]] = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_librarian),
+):
+    # Never loads the password column
+    query = db.query(*projection(User, UserResponse))
+    if role is not None:
+        query = query.filter(User.role == role)
+    return page_response(keyset(query, User.id, after, limit).all(), limit, UserResponse)
 
 # Get User by ID
 @router.get("/{user_id}", response_model=UserResponse)
@@ -88,4 +128,6 @@ def delete_user(user_id: int, db: Session = Depends(get_db), _: User = Depends(r
 
     db.delete(user)
     db.commit()
+    # Revoke any cached principal so outstanding tokens stop working right away
+    revoke_principal(user_id)
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, Literal
 from datetime import date
 
@@ -35,6 +35,31 @@ class BookResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# A book suggested from borrowing patterns; higher scores are closer matches
+class RecommendedBook(BookResponse):
+    score: float
+
+# Availability calendar
+class DayAvailability(BaseModel):
+    day: date
+    free_copies: int
+
+class BookAvailabilityResponse(BaseModel):
+    book_id: int
+    days: list[DayAvailability]
+
+# Bulk import report
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: list[BulkImportError]
+
 # Borrow Request Schema
 class BorrowRequestCreate(BaseModel):
     book_id: int
@@ -52,6 +77,32 @@ class BorrowRequestResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Compact related objects embedded by `expand=book,user` on borrow request / history lists
+class BookSummary(BaseModel):
+    id: int
+    title: str
+    author: str
+
+class UserSummary(BaseModel):
+    id: int
+    name: str
+    email: str
+
+class BorrowRequestExpanded(BorrowRequestResponse):
+    book: Optional[BookSummary] = None
+    user: Optional[UserSummary] = None
+
+# Batch approve / deny
+class BorrowDecision(BaseModel):
+    request_ids: list[int] = Field(..., min_length=1, max_length=1000)
+    status: Literal["approved", "denied"]
+
+class BorrowDecisionResult(BaseModel):
+    id: int
+    ok: bool
+    status: Optional[str] = None
+    detail: Optional[str] = None
+
 # Borrow History Schema
 
 class BorrowHistoryResponse(BaseModel):
@@ -65,7 +116,38 @@ class BorrowHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BorrowHistoryExpanded(BorrowHistoryResponse):
+    book: Optional[BookSummary] = None
+    user: Optional[UserSummary] = None
+
+
 
+# Circulation reports
+class TopBookEntry(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    total_loans: int
+    active_loans: int
+
+class UserLoanEntry(BaseModel):
+    user_id: int
+    name: str
+    active_loans: int
+    total_loans: int
+    overdue_loans: int
+
+class MonthlyCirculationEntry(BaseModel):
+    month: str
+    loans: int
+    returns: int
+    overdues: int
+
+class OverdueRateResponse(BaseModel):
+    loans: int
+    overdues: int
+    overdue_rate: float
+    currently_overdue: int
 
 # Schema for user login request
 class UserLogin(BaseModel):
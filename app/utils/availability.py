@@ -0,0 +1,58 @@
+from datetime import date, datetime, timezone
+from sqlalchemy.orm import Session
+from ..models import Book, BorrowHistory
+
+# Loans that still hold a copy
+ACTIVE_LOAN_STATUSES = ("borrowed", "overdue")
+MAX_WINDOW_DAYS = 366
+
+def free_copies_by_day(capacity: int, loans: list[tuple[date, date]], start: date, end: date) -> list[int]:
+    "Sweep line over (first_day, last_day) loans: free copies for each day from start to end."
+    days = (end - start).days + 1
+    # Difference array: +1 where a loan starts, -1 the day after it ends
+    delta = [0] * (days + 1)
+    for first, last in loans:
+        lo = max((first - start).days, 0)
+        hi = min((last - start).days, days - 1)
+        if lo > hi:
+            continue
+        delta[lo] += 1
+        delta[hi + 1] -= 1
+
+    free = []
+    on_loan = 0
+    for day in range(days):
+        on_loan += delta[day]
+        free.append(capacity - on_loan)
+    return free
+
+def book_calendar(db: Session, book: Book, start: date, end: date) -> list[int]:
+    """Free copies of `book` per day between start and end, counting approved loans that are still out.
+
+    Same model as available_copies: approval takes the copy off the shelf right
+    away, whatever the loan's start date, and it is expected back after end_date.
+    So every day up to a loan's end date shows the copy as out, and the calendar
+    agrees with the counter until the first expected return. A loan whose end
+    date has passed (overdue, or borrowed until the sweep catches it) has no
+    expected return, so it holds its copy through the end of the window.
+    """
+    today = datetime.now(timezone.utc).date()
+    # One lookup on ix_borrow_history_book_status; a title can't have more active loans than copies
+    loans = db.query(BorrowHistory.start_date, BorrowHistory.end_date).filter(
+        BorrowHistory.book_id == book.id,
+        BorrowHistory.status.in_(ACTIVE_LOAN_STATUSES),
+    ).all()
+
+    intervals = []
+    for loan_start, loan_end in loans:
+        # Out since approval, not since the loan's start date
+        first = min(loan_start.date(), today)
+        last = loan_end.date() if loan_end else None
+        if last is None or last < today:
+            # Past its end date: out until it is returned, whenever that is
+            last = end
+        intervals.append((first, last))
+
+    # Active loans already took their copy out of available_copies at approval time
+    capacity = (book.available_copies or 0) + len(loans)
+    return free_copies_by_day(capacity, intervals, start, end)
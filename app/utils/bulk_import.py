@@ -0,0 +1,149 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ..models import Book
+from ..schemas import BookCreate
+
+# Stop collecting error details past this many (the failed count keeps going)
+MAX_REPORTED_ERRORS = 1000
+
+books = Book.__table__
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    "Decode a byte stream into (line number, line) pairs without buffering the whole body."
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield line_number + 1, pending.rstrip("\r")
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    "Yield (line, record, error) for each CSV row (one per line, with a header) or NDJSON object."
+    header = None
+    async for line_number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, record, None
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield line_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty CSV cells mean "not given" so schema defaults apply
+        yield line_number, {key: value for key, value in zip(header, values) if value != ""}, None
+
+def parse_book(record: dict) -> dict:
+    "Validate a record with the same schema as POST /books/."
+    record.setdefault("isbn", None)
+    book = BookCreate.model_validate(record).model_dump()
+    if book["available_copies"] is None:
+        book["available_copies"] = 1
+    return book
+
+def upsert_books(db: Session, rows: list[dict]) -> tuple[int, int]:
+    "Insert a batch of books, adding to available_copies for ISBNs that already exist. Returns (created, updated)."
+    by_isbn: dict[str, dict] = {}
+    without_isbn = []
+    for row in rows:
+        if not row["isbn"]:
+            without_isbn.append(row)
+        elif row["isbn"] in by_isbn:
+            by_isbn[row["isbn"]]["available_copies"] += row["available_copies"]
+        else:
+            by_isbn[row["isbn"]] = dict(row)
+
+    existing = set(db.scalars(select(Book.isbn).where(Book.isbn.in_(list(by_isbn))))) if by_isbn else set()
+    dialect = db.get_bind().dialect.name
+    if by_isbn and dialect in ("mysql", "sqlite"):
+        if dialect == "mysql":
+            stmt = mysql_insert(books)
+            stmt = stmt.on_duplicate_key_update(available_copies=books.c.available_copies + stmt.inserted.available_copies)
+        else:
+            stmt = sqlite_insert(books)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[books.c.isbn],
+                set_={"available_copies": books.c.available_copies + stmt.excluded.available_copies},
+            )
+        db.execute(stmt, list(by_isbn.values()))
+    elif by_isbn:
+        # No native upsert: update the ISBNs we saw, insert the rest
+        updates = [{"b_isbn": isbn, "b_copies": row["available_copies"]} for isbn, row in by_isbn.items() if isbn in existing]
+        if updates:
+            db.execute(
+                update(books)
+                .where(books.c.isbn == bindparam("b_isbn"))
+                .values(available_copies=books.c.available_copies + bindparam("b_copies")),
+                updates,
+            )
+        inserts = [row for isbn, row in by_isbn.items() if isbn not in existing]
+        if inserts:
+            db.execute(insert(books), inserts)
+    if without_isbn:
+        db.execute(insert(books), without_isbn)
+    db.commit()
+    return len(by_isbn) - len(existing) + len(without_isbn), len(existing)
+
+async def import_books(db: Session, chunks: AsyncIterator[bytes], fmt: str, batch_size: int) -> dict:
+    "Stream-parse an upload and upsert it in fixed-size batches, collecting per-line errors."
+    report = {"processed": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(line_number: int, error: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "error": error})
+
+    async def flush(batch: list[tuple[int, dict]]):
+        try:
+            created, updated = await run_in_threadpool(upsert_books, db, [row for _, row in batch])
+        except Exception as exc:
+            await run_in_threadpool(db.rollback)
+            for line_number, _ in batch:
+                fail(line_number, f"Batch failed: {exc.__class__.__name__}")
+            return
+        report["created"] += created
+        report["updated"] += updated
+
+    batch: list[tuple[int, dict]] = []
+    async for line_number, record, error in iter_records(chunks, fmt):
+        report["processed"] += 1
+        if error is None:
+            try:
+                batch.append((line_number, parse_book(record)))
+            except ValidationError as exc:
+                first = exc.errors()[0]
+                error = f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}"
+        if error is not None:
+            fail(line_number, error)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return report
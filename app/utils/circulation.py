@@ -0,0 +1,114 @@
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import select, insert, update, delete, func, case, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import BorrowHistory, BorrowHistoryArchive, BookCirculation, UserCirculation, MonthlyCirculation
+
+# Incremental maintenance of the circulation rollups. Every helper runs inside the
+# caller's transaction, so a rollup changes exactly when the loan it describes does.
+
+def month_key(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _bump(db: Session, model, key_column, key, **deltas):
+    "Add deltas to one rollup row, creating it on first use."
+    values = {name: getattr(model, name) + delta for name, delta in deltas.items()}
+    result = db.execute(
+        update(model).where(key_column == key).values(values).execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(model).values({key_column.key: key, **deltas}))
+    except IntegrityError:
+        # Another transaction created the row first
+        db.execute(
+            update(model).where(key_column == key).values(values).execution_options(synchronize_session=False)
+        )
+
+def record_loan(db: Session, user_id: int, book_id: int, start_date: datetime, count: int = 1):
+    "An approval created a loan (count=-1 undoes one that was withdrawn)."
+    _bump(db, BookCirculation, BookCirculation.book_id, book_id, total_loans=count, active_loans=count)
+    _bump(db, UserCirculation, UserCirculation.user_id, user_id, total_loans=count, active_loans=count)
+    _bump(db, MonthlyCirculation, MonthlyCirculation.month, month_key(start_date), loans=count)
+
+def record_return(db: Session, user_id: int, book_id: int, was_overdue: bool, returned_at: datetime | None = None):
+    overdue = -1 if was_overdue else 0
+    _bump(db, BookCirculation, BookCirculation.book_id, book_id, active_loans=-1, overdue_loans=overdue)
+    _bump(db, UserCirculation, UserCirculation.user_id, user_id, active_loans=-1, overdue_loans=overdue)
+    _bump(db, MonthlyCirculation, MonthlyCirculation.month, month_key(returned_at or _now()), returns=1)
+
+def record_overdue(db: Session, loans: list[tuple[int, int]], when: datetime | None = None):
+    "A batch of (user_id, book_id) loans went overdue."
+    if not loans:
+        return
+    for book_id, count in Counter(book_id for _, book_id in loans).items():
+        _bump(db, BookCirculation, BookCirculation.book_id, book_id, overdue_loans=count, total_overdues=count)
+    for user_id, count in Counter(user_id for user_id, _ in loans).items():
+        _bump(db, UserCirculation, UserCirculation.user_id, user_id, overdue_loans=count, total_overdues=count)
+    _bump(db, MonthlyCirculation, MonthlyCirculation.month, month_key(when or _now()), overdues=len(loans))
+
+def _month_expr(db: Session, column):
+    if db.get_bind().dialect.name == "mysql":
+        return func.date_format(column, "%Y-%m")
+    return func.strftime("%Y-%m", column)
+
+def _totals(db: Session, history, key, active, overdue) -> list[dict]:
+    """Per-key rows for a book or user rollup, keeping each row's total_overdues.
+
+    total_overdues counts loans at the moment they went overdue, so it stays at
+    least the number overdue now.
+    """
+    kept = dict(db.execute(select(key, key.class_.total_overdues)).all())
+    group = history.c[key.key]
+    return [
+        {key.key: row_key, "total_loans": loans, "active_loans": active_loans, "overdue_loans": overdue_loans,
+         "total_overdues": max(kept.get(row_key, 0), overdue_loans)}
+        for row_key, loans, active_loans, overdue_loans in db.execute(
+            select(group, func.count(), func.sum(active), func.sum(overdue)).group_by(group)
+        )
+    ]
+
+def rebuild(db: Session) -> dict:
+    """Recompute the rollups from borrow_history and its archive (for backfills and repairs).
+
+    Loan counts, active loans and current overdues are recomputed. History keeps
+    no return or overdue timestamps, so the columns the incremental path counts
+    when those events happen are kept as they were: total_overdues (raised to
+    the current overdue count where it is lower) and the monthly returns and
+    overdues. A backfill starts those at zero.
+    """
+    # Archived loans still count towards totals
+    columns = ("user_id", "book_id", "start_date", "end_date", "status")
+    history = union_all(
+        select(*(getattr(BorrowHistory, name) for name in columns)),
+        select(*(getattr(BorrowHistoryArchive, name) for name in columns)),
+    ).subquery()
+
+    active = case((history.c.status.in_(("borrowed", "overdue")), 1), else_=0)
+    overdue = case((history.c.status == "overdue", 1), else_=0)
+
+    books = _totals(db, history, BookCirculation.book_id, active, overdue)
+    users = _totals(db, history, UserCirculation.user_id, active, overdue)
+    months = {
+        row.month: {"month": row.month, "loans": 0, "returns": row.returns, "overdues": row.overdues}
+        for row in db.execute(select(MonthlyCirculation.month, MonthlyCirculation.returns, MonthlyCirculation.overdues))
+    }
+    start_month = _month_expr(db, history.c.start_date)
+    for month, loans in db.execute(select(start_month, func.count()).group_by(start_month)):
+        months.setdefault(month, {"month": month, "loans": 0, "returns": 0, "overdues": 0})["loans"] = loans
+
+    db.execute(delete(BookCirculation))
+    db.execute(delete(UserCirculation))
+    db.execute(delete(MonthlyCirculation))
+    for model, rows in ((BookCirculation, books), (UserCirculation, users), (MonthlyCirculation, list(months.values()))):
+        if rows:
+            db.execute(insert(model), rows)
+
+    db.commit()
+    return {"books": len(books), "users": len(users), "months": len(months)}
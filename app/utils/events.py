@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import threading
+import orjson
+
+logger = logging.getLogger("app.events")
+
+# Empty: fan out inside this worker only. redis://...: fan out to every worker through Redis pub/sub.
+EVENT_BUS_URL = os.getenv("EVENT_BUS_URL", "")
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "library:events")
+# Events buffered per subscriber before it is told to resync instead
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+# Sent to a subscriber that fell behind; its missed events are dropped and it should reload
+RESYNC = {"type": "resync"}
+
+class Subscription:
+    "One listener's queue. Only events that pass `accepts` are queued."
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, user_id: int | None):
+        self.loop = loop
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    def accepts(self, event: dict) -> bool:
+        return self.user_id is None or event is RESYNC or event.get("user_id") == self.user_id
+
+    def offer(self, event: dict):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+class EventBus:
+    """Fans committed changes out to open event streams.
+
+    publish() may be called from any thread (sync routes run in the threadpool);
+    delivery hops onto each subscriber's event loop with call_soon_threadsafe.
+    The local backend delivers directly; the Redis backend publishes to a
+    channel and every worker, including this one, delivers what it receives.
+
+    Event types registered with on() are for the workers themselves: every
+    worker runs the handler and no stream sees the event.
+    """
+
+    def __init__(self, url: str = "", channel: str = EVENT_BUS_CHANNEL):
+        self.url = url
+        self.channel = channel
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._listener: asyncio.Task | None = None
+        self._handlers: dict[str, list] = {}
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id: int | None = None) -> Subscription:
+        "Register a listener on the running loop; user_id limits it to that user's events."
+        subscription = Subscription(asyncio.get_running_loop(), user_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def on(self, event_type: str, handler):
+        "Run handler(event) in every worker for events of this type."
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def publish(self, event: dict):
+        self.published += 1
+        if self.url:
+            try:
+                self._redis_client().publish(self.channel, orjson.dumps(event))
+            except Exception:
+                # Notifications are best-effort; the change itself is already committed
+                logger.exception("event publish failed")
+            return
+        self.dispatch(event)
+
+    def dispatch(self, event: dict):
+        "Deliver to local subscribers."
+        handlers = self._handlers.get(event.get("type"))
+        if handlers:
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception:
+                    logger.exception("event handler failed")
+            return
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.accepts(event)]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                self.unsubscribe(subscription)
+                continue
+            self.delivered += 1
+
+    def _redis_client(self):
+        if self._redis is None:
+            import redis  # optional dependency, only needed with EVENT_BUS_URL
+            self._redis = redis.Redis.from_url(self.url)
+        return self._redis
+
+    async def start(self):
+        "Start relaying the shared channel into this worker (Redis backend only)."
+        if self.url and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.dispatch(orjson.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("event listener lost its connection, reconnecting")
+                # Subscribers may have missed events while disconnected
+                self.dispatch(RESYNC)
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis" if self.url else "local",
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+event_bus = EventBus(EVENT_BUS_URL)
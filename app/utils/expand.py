@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import select
+from ..schemas import BookSummary, UserSummary
+from .fastjson import projection, row_dicts, json_page
+from .listing import split_page
+
+# `expand=book,user` on borrow request / history lists embeds compact summaries of the related
+# rows. List pages are projected rows rather than entities, so the model relationships are
+# loaded the way selectinload loads them: one `id IN (...)` query per relationship for the
+# whole page. A page costs 1 + len(expand) statements however many rows it has.
+
+# Relationship name on BorrowRequest / BorrowHistory -> embedded schema
+EXPANSIONS: dict[str, type[BaseModel]] = {"book": BookSummary, "user": UserSummary}
+
+def parse_expand(
+    expand: Optional[str] = Query(None, description="Comma-separated related objects to embed: book, user"),
+) -> tuple[str, ...]:
+    names = tuple(sorted({name.strip() for name in expand.split(",") if name.strip()})) if expand else ()
+    unknown = [name for name in names if name not in EXPANSIONS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown expand value: {', '.join(unknown)}")
+    return names
+
+def _lookups(model, items: list[dict], expand: tuple[str, ...]):
+    "(name, foreign key, schema, statement) for each relationship to load."
+    for name in expand:
+        relationship = getattr(model, name).property
+        (local, remote), = relationship.local_remote_pairs
+        ids = {item[local.key] for item in items}
+        schema = EXPANSIONS[name]
+        target = relationship.mapper.class_
+        yield name, local.key, schema, select(*projection(target, schema)).where(remote.in_(ids))
+
+def _attach(items: list[dict], name: str, key: str, rows, schema: type[BaseModel]):
+    related = {row["id"]: row for row in row_dicts(rows, schema)}
+    for item in items:
+        item[name] = related.get(item[key])
+
+def expanded_page(db, model, rows, limit: int, schema: type[BaseModel], expand: tuple[str, ...]) -> Response:
+    """page_response with the relationships in `expand` embedded.
+
+    `model` supplies the relationships; rows from the history archive share
+    BorrowHistory's columns, so mixed pages use BorrowHistory.
+    """
+    rows, next_cursor = split_page(rows, limit)
+    items = row_dicts(rows, schema)
+    if items:
+        for name, key, related_schema, stmt in _lookups(model, items, expand):
+            _attach(items, name, key, db.execute(stmt).all(), related_schema)
+    return json_page(items, next_cursor)
+
+async def aexpanded_page(db, model, rows, limit: int, schema: type[BaseModel], expand: tuple[str, ...]) -> Response:
+    "expanded_page for an AsyncSession."
+    rows, next_cursor = split_page(rows, limit)
+    items = row_dicts(rows, schema)
+    if items:
+        for name, key, related_schema, stmt in _lookups(model, items, expand):
+            _attach(items, name, key, (await db.execute(stmt)).all(), related_schema)
+    return json_page(items, next_cursor)
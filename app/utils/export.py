@@ -0,0 +1,60 @@
+import csv
+import io
+import os
+from typing import Literal
+import orjson
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from ..db import read_session
+from .fastjson import row_dicts
+
+# Rows fetched from the server-side cursor per round trip, and per chunk sent to the client
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+def _csv_chunks(batches, fields: list[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for items in batches:
+        writer.writerows([item[name] for name in fields] for item in items)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _ndjson_chunks(batches):
+    for items in batches:
+        yield b"".join(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE) for item in items)
+
+def stream_rows(statements: list, schema: type[BaseModel], fmt: ExportFormat, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the rows of each statement in turn, rendered as CSV or NDJSON, one chunk per batch.
+
+    The generator owns its session: the request's session is closed before the
+    body is sent. yield_per makes the driver use an unbuffered (server-side)
+    cursor, so memory is bounded by one batch however many rows match.
+    """
+    db = read_session()
+    try:
+        batches = (
+            row_dicts(rows, schema)
+            for stmt in statements
+            for rows in db.execute(stmt.execution_options(yield_per=batch_size)).partitions()
+        )
+        if fmt == "csv":
+            yield from _csv_chunks(batches, list(schema.model_fields))
+        else:
+            yield from _ndjson_chunks(batches)
+    finally:
+        db.close()
+
+def export_response(statements: list, schema: type[BaseModel], fmt: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(statements, schema, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
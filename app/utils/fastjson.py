@@ -0,0 +1,52 @@
+import types
+import typing
+from datetime import date, datetime
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from .listing import split_page, NEXT_CURSOR_HEADER
+
+# Fast path for list routes: select only the response columns as plain rows and
+# render them with orjson, skipping per-object ORM loading and Pydantic validation.
+# Only use it for rows read straight from our own tables.
+
+def _is_date(annotation) -> bool:
+    if annotation is date:
+        return True
+    # Optional[date] / date | None
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        return any(arg is date for arg in typing.get_args(annotation))
+    return False
+
+def projection(model, schema: type[BaseModel]) -> list:
+    "The columns of `model` named by the fields of `schema`, in field order."
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _date_fields(schema: type[BaseModel]) -> list[str]:
+    # DATETIME columns exposed as `date` in the schema are truncated, as validation would
+    return [name for name, field in schema.model_fields.items() if _is_date(field.annotation)]
+
+def row_dicts(rows, schema: type[BaseModel]) -> list[dict]:
+    "Turn projected rows into dicts shaped like `schema`."
+    date_fields = _date_fields(schema)
+    items = []
+    for row in rows:
+        item = row._asdict()
+        for name in date_fields:
+            value = item[name]
+            if isinstance(value, datetime):
+                item[name] = value.date()
+        items.append(item)
+    return items
+
+def render_rows(rows, schema: type[BaseModel]) -> bytes:
+    return orjson.dumps(row_dicts(rows, schema))
+
+def json_page(items: list[dict], next_cursor: int | None) -> Response:
+    headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else None
+    return Response(content=orjson.dumps(items), media_type="application/json", headers=headers)
+
+def page_response(rows, limit: int, schema: type[BaseModel]) -> Response:
+    "A rendered keyset page, with the next cursor header when there is more."
+    rows, next_cursor = split_page(rows, limit)
+    return json_page(row_dicts(rows, schema), next_cursor)
@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger("app.sql")
+
+# Statements slower than this are logged with their SQL
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    sql_time: float = 0.0
+    pool_wait: float = 0.0
+
+class _Totals:
+    "Process-wide counters exposed on /metrics."
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.statements = 0
+        self.sql_time = 0.0
+        self.slow_queries = 0
+        self.pool_checkouts = 0
+        self.pool_wait = 0.0
+        self.max_pool_wait = 0.0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_statement(self, elapsed: float, slow: bool):
+        with self._lock:
+            self.statements += 1
+            self.sql_time += elapsed
+            self.slow_queries += slow
+
+    def add_pool_wait(self, elapsed: float):
+        with self._lock:
+            self.pool_checkouts += 1
+            self.pool_wait += elapsed
+            self.max_pool_wait = max(self.max_pool_wait, elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "statements": self.statements,
+                "sql_time_ms": round(self.sql_time * 1000, 3),
+                "slow_queries": self.slow_queries,
+                "pool_checkouts": self.pool_checkouts,
+                "pool_wait_ms": round(self.pool_wait * 1000, 3),
+                "max_pool_wait_ms": round(self.max_pool_wait * 1000, 3),
+            }
+
+totals = _Totals()
+
+# Stats for the request being handled; the object is shared with the threadpool via context copies
+_current: ContextVar[RequestStats | None] = ContextVar("request_sql_stats", default=None)
+
+def begin_request() -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    totals.add_request()
+    return stats
+
+def response_headers(stats: RequestStats) -> dict[str, str]:
+    return {
+        "X-SQL-Count": str(stats.statements),
+        "X-SQL-Time-ms": f"{stats.sql_time * 1000:.3f}",
+        "X-DB-Pool-Wait-ms": f"{stats.pool_wait * 1000:.3f}",
+    }
+
+def _record_pool_wait(elapsed: float):
+    totals.add_pool_wait(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += elapsed
+
+class _TimedCheckoutMixin:
+    # SQLAlchemy has no "checkout requested" event, so time the pool's own get
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_pool_wait(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    if slow:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+    totals.add_statement(elapsed, slow)
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_time += elapsed
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute; drop their start time
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+def instrument_engine(engine):
+    "Attach statement timing listeners to a (sync) engine."
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    return {"status": pool.status()}
@@ -0,0 +1,38 @@
+from datetime import date, datetime, time, timedelta
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def keyset(query, column, after: int | None, limit: int):
+    "Restrict a query to one keyset page ordered by `column`."
+    if after is not None:
+        query = query.filter(column > after)
+    # Fetch one extra row so we know whether another page exists
+    return query.order_by(column).limit(limit + 1)
+
+def split_page(rows, limit: int):
+    "Trim the extra row fetched by `keyset`; returns (rows, next cursor or None)."
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+def filter_borrow_query(query, model, status=None, user_id=None, book_id=None,
+                        start_from: date | None = None, start_to: date | None = None):
+    "Apply the shared borrow request / history filters to a query."
+    if status is not None:
+        query = query.filter(model.status == status)
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    if book_id is not None:
+        query = query.filter(model.book_id == book_id)
+    if start_from is not None:
+        query = query.filter(model.start_date >= datetime.combine(start_from, time.min))
+    if start_to is not None:
+        # start_date is a DATETIME, so make the upper bound inclusive of the whole day
+        query = query.filter(model.start_date < datetime.combine(start_to + timedelta(days=1), time.min))
+    return query
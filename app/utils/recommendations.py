@@ -0,0 +1,381 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models import BorrowHistory, BorrowHistoryArchive
+
+# "Readers also borrowed": item-item cosine similarity over the binary user x book loan
+# matrix A. sim(i, j) = co(i, j) / sqrt(n_i * n_j), where co = AᵀA counts readers of both
+# books and n_i = co(i, i) counts readers of i. Only the top K neighbours per book are kept;
+# AᵀA itself is never materialized, it is computed a block of books at a time.
+#
+# The model is built offline by `python -m app.cli recommendations`, which reads the loan
+# history once and writes an .npz artifact to RECOMMENDATIONS_PATH. Workers only load that
+# file (and reload it when it changes), so they never read history themselves.
+# numpy/scipy are imported on first use so they don't slow down worker start.
+
+logger = logging.getLogger("app.recommendations")
+
+# Model artifact written by the CLI and loaded by workers; unset disables recommendations
+RECOMMENDATIONS_PATH = os.getenv("RECOMMENDATIONS_PATH", "")
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "50"))
+# Lists keep twice what is served, so incremental updates can drop entries and still serve exact top Ks
+LIST_SIZE = 2 * RECOMMENDATIONS_TOP_K
+# Seconds between worker checks for a new artifact
+RECOMMENDATIONS_RELOAD_INTERVAL = float(os.getenv("RECOMMENDATIONS_RELOAD_INTERVAL", "60"))
+# Age in seconds after which the CLI rebuilds in full, which also drops loans that were withdrawn since
+RECOMMENDATIONS_REBUILD_INTERVAL = float(os.getenv("RECOMMENDATIONS_REBUILD_INTERVAL", "86400"))
+# History ids re-read below the watermark on each incremental run, to catch transactions that
+# committed out of id order (re-reading is harmless: A is binary)
+RECOMMENDATIONS_ID_OVERLAP = int(os.getenv("RECOMMENDATIONS_ID_OVERLAP", "1000"))
+
+BLOCK_SIZE = 2048
+POPULAR_SIZE = 1000
+
+class RecommendationsNotReady(Exception):
+    "This worker has no model loaded (none configured, or not built yet)."
+
+@dataclass
+class Snapshot:
+    loans: object  # csr_matrix, users x books, 1 where the user borrowed the book
+    readers: object  # csr_matrix, the transpose, books x users
+    counts: object  # ndarray, readers per book
+    related: dict[int, list[tuple[int, float]]]  # book id -> [(book id, score)] best first
+    popular: list[int]
+    watermark: int  # highest borrow_history id included
+    built_at: float = field(default_factory=time.time)  # last full build
+
+def read_loans(db: Session, after_id: int | None = None, batch_size: int = 100_000):
+    """(user ids, book ids, max history id) as int arrays, streamed in batches.
+
+    A full read (after_id None) includes the archive, whose ids are all below
+    the live table's.
+    """
+    users, books = array("l"), array("l")
+    max_id = 0
+    sources = [BorrowHistory] if after_id is not None else [BorrowHistoryArchive, BorrowHistory]
+    for model in sources:
+        stmt = select(model.id, model.user_id, model.book_id)
+        if after_id is not None:
+            stmt = stmt.where(model.id > after_id)
+        for rows in db.execute(stmt.execution_options(yield_per=batch_size)).partitions():
+            for history_id, user_id, book_id in rows:
+                users.append(user_id)
+                books.append(book_id)
+                if history_id > max_id:
+                    max_id = history_id
+    return users, books, max_id
+
+def _binary(users, books, shape):
+    import numpy as np
+    from scipy.sparse import coo_matrix
+    matrix = coo_matrix(
+        (np.ones(len(users), dtype=np.int32), (np.asarray(users, dtype=np.int64), np.asarray(books, dtype=np.int64))),
+        shape=shape,
+    ).tocsr()  # sums repeat loans of the same book...
+    matrix.data[:] = 1  # ...which count once
+    return matrix
+
+def _resized(matrix, shape):
+    if matrix.shape == shape:
+        return matrix
+    matrix = matrix.copy()
+    matrix.resize(shape)
+    return matrix
+
+def _top_k(book_id: int, cols, co, counts, k: int) -> list[tuple[int, float]]:
+    import numpy as np
+    keep = cols != book_id
+    cols, co = cols[keep], co[keep]
+    if not len(cols):
+        return []
+    # Rounded before ranking, so equal similarities computed along different float paths tie
+    scores = np.round(co / np.sqrt(float(counts[book_id]) * counts[cols]), 6)
+    if len(scores) > k:
+        # Keep everything tied with the k-th score so ties are broken by id, not by partition order
+        threshold = -np.partition(-scores, k - 1)[k - 1]
+        keep = scores >= threshold
+        cols, scores = cols[keep], scores[keep]
+    order = np.lexsort((cols, -scores))[:k]  # best score first, ties by id
+    return [(int(cols[i]), float(scores[i])) for i in order]
+
+def _co_rows(readers, loans, books):
+    "(book id, co-borrowed book ids, co-counts) for each of `books`, computed a block of rows at a time."
+    for start in range(0, len(books), BLOCK_SIZE):
+        block_books = books[start:start + BLOCK_SIZE]
+        block = (readers[block_books] @ loans).tocsr()
+        for row, book_id in enumerate(block_books):
+            lo, hi = block.indptr[row], block.indptr[row + 1]
+            yield int(book_id), block.indices[lo:hi], block.data[lo:hi]
+
+def _set_related(related: dict, book_id: int, neighbours: list):
+    if neighbours:
+        related[book_id] = neighbours
+    else:
+        related.pop(book_id, None)
+
+def _popular(counts) -> list[int]:
+    import numpy as np
+    top = np.argsort(-counts, kind="stable")[:POPULAR_SIZE]
+    return [int(book_id) for book_id in top if counts[book_id] > 0]
+
+def build(users, books, watermark: int, k: int = LIST_SIZE) -> Snapshot:
+    "Full build from (user id, book id) pairs."
+    import numpy as np
+    shape = (max(users, default=0) + 1, max(books, default=0) + 1)
+    loans = _binary(users, books, shape)
+    readers = loans.T.tocsr()
+    counts = np.asarray(loans.sum(axis=0)).ravel()
+    related: dict[int, list[tuple[int, float]]] = {}
+    for book_id, cols, co in _co_rows(readers, loans, np.flatnonzero(counts)):
+        _set_related(related, book_id, _top_k(book_id, cols, co, counts, k))
+    return Snapshot(loans, readers, counts, related, _popular(counts), watermark)
+
+def update(snapshot: Snapshot, users, books, watermark: int, k: int = LIST_SIZE) -> tuple[Snapshot, int]:
+    """Fold new loans into a snapshot. Returns (new snapshot, books whose lists were recomputed).
+
+    Books that gained readers get their lists recomputed exactly. In every
+    other book's list, the touched book's entry is re-scored, added or dropped
+    in place. A list can only go wrong when more entries drop out of it than
+    its margin over the served size; full rebuilds correct that.
+    """
+    import numpy as np
+    if not len(users):
+        return Snapshot(snapshot.loans, snapshot.readers, snapshot.counts, snapshot.related, snapshot.popular,
+                        max(snapshot.watermark, watermark)), 0
+    old_rows, old_cols = snapshot.loans.shape
+    shape = (max(old_rows, max(users) + 1), max(old_cols, max(books) + 1))
+    loans = _resized(snapshot.loans, shape)
+    added = _binary(users, books, shape)
+    added = (added - added.multiply(loans)).tocsr()  # pairs that are new
+    added.eliminate_zeros()
+    if not added.nnz:
+        return Snapshot(loans, _resized(snapshot.readers, shape[::-1]), snapshot.counts, snapshot.related,
+                        snapshot.popular, max(snapshot.watermark, watermark)), 0
+
+    loans = (loans + added).tocsr()
+    readers = (_resized(snapshot.readers, shape[::-1]) + added.T).tocsr()
+    counts = np.zeros(shape[1], dtype=snapshot.counts.dtype)
+    counts[:len(snapshot.counts)] = snapshot.counts
+    counts += np.asarray(added.sum(axis=0)).ravel().astype(counts.dtype)
+
+    related = dict(snapshot.related)
+    touched = np.unique(added.indices)
+    touched_set = set(int(book_id) for book_id in touched)
+    # For the other lists: the score a touched book needs to enter them, and where it already is
+    floor = np.full(shape[1], -np.inf)
+    listed: dict[int, list[int]] = {}  # touched book -> neighbours whose lists hold it
+    for neighbour, entries in related.items():
+        if neighbour in touched_set:
+            continue
+        if len(entries) >= k:
+            floor[neighbour] = entries[-1][1]
+        for entry in entries:
+            if entry[0] in touched_set:
+                listed.setdefault(entry[0], []).append(neighbour)
+    candidates: dict[int, list[tuple[int, float]]] = {}
+    for book_id, cols, co in _co_rows(readers, loans, touched):
+        _set_related(related, book_id, _top_k(book_id, cols, co, counts, k))
+        # co-counts are symmetric, so this row also holds the touched book's score in every other list
+        scores = np.round(co / np.sqrt(float(counts[book_id]) * counts[cols]), 6)
+        # Entries already listed are re-scored even if they now fall below the floor
+        keep = (scores >= floor[cols]) | np.isin(cols, listed.get(book_id, ()))
+        keep &= ~np.isin(cols, touched)
+        for neighbour, score in zip(cols[keep].tolist(), scores[keep].tolist()):
+            candidates.setdefault(neighbour, []).append((book_id, score))
+    for neighbour in candidates:
+        entries = [entry for entry in related.get(neighbour, []) if entry[0] not in touched_set]
+        entries.extend(candidates.get(neighbour, ()))
+        entries.sort(key=lambda entry: (-entry[1], entry[0]))
+        _set_related(related, neighbour, entries[:k])
+
+    return Snapshot(loans, readers, counts, related, _popular(counts), max(snapshot.watermark, watermark)), len(touched_set)
+
+def refresh(db: Session, snapshot: Snapshot | None, full: bool = False) -> tuple[Snapshot, dict]:
+    "Full build when asked, when there's no snapshot or it is due; otherwise fold in loans past the watermark."
+    started = time.perf_counter()
+    if full or snapshot is None or time.time() - snapshot.built_at >= RECOMMENDATIONS_REBUILD_INTERVAL:
+        users, books, max_id = read_loans(db)
+        snapshot = build(users, books, max_id)
+        report = {"mode": "full", "books_recomputed": len(snapshot.related)}
+    else:
+        users, books, max_id = read_loans(db, max(0, snapshot.watermark - RECOMMENDATIONS_ID_OVERLAP))
+        built_at = snapshot.built_at
+        snapshot, recomputed = update(snapshot, users, books, max_id)
+        snapshot.built_at = built_at
+        report = {"mode": "incremental", "books_recomputed": recomputed}
+    report.update(seconds=round(time.perf_counter() - started, 3), watermark=snapshot.watermark, loans=int(snapshot.loans.nnz))
+    return snapshot, report
+
+def save(snapshot: Snapshot, path: str):
+    "Write the artifact atomically, so workers never load a half-written file."
+    import numpy as np
+    book_ids = np.array(sorted(snapshot.related), dtype=np.int64)
+    lengths = np.array([len(snapshot.related[book_id]) for book_id in book_ids.tolist()], dtype=np.int64)
+    entries = [entry for book_id in book_ids.tolist() for entry in snapshot.related[book_id]]
+    loans = snapshot.loans
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        np.savez(
+            handle,
+            loans_indptr=loans.indptr, loans_indices=loans.indices, loans_shape=np.array(loans.shape),
+            related_books=book_ids,
+            related_indptr=np.concatenate(([0], np.cumsum(lengths))),
+            related_ids=np.array([book_id for book_id, _ in entries], dtype=np.int64),
+            related_scores=np.array([score for _, score in entries], dtype=np.float64),
+            popular=np.array(snapshot.popular, dtype=np.int64),
+            meta=np.array([snapshot.watermark, snapshot.built_at], dtype=np.float64),
+        )
+    os.replace(tmp_path, path)
+
+def _load_arrays(path: str):
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    indices = arrays["loans_indices"]
+    loans = csr_matrix((np.ones(len(indices), dtype=np.int32), indices, arrays["loans_indptr"]),
+                       shape=tuple(int(n) for n in arrays["loans_shape"]))
+    return loans, arrays
+
+def load_snapshot(path: str) -> Snapshot:
+    "The full snapshot from an artifact, for the next incremental run."
+    import numpy as np
+    loans, arrays = _load_arrays(path)
+    indptr, ids, scores = arrays["related_indptr"], arrays["related_ids"].tolist(), arrays["related_scores"].tolist()
+    related = {
+        book_id: list(zip(ids[indptr[row]:indptr[row + 1]], scores[indptr[row]:indptr[row + 1]]))
+        for row, book_id in enumerate(arrays["related_books"].tolist())
+    }
+    watermark, built_at = arrays["meta"].tolist()
+    counts = np.asarray(loans.sum(axis=0)).ravel()
+    return Snapshot(loans, loans.T.tocsr(), counts, related, arrays["popular"].tolist(), int(watermark), built_at)
+
+@dataclass
+class Model:
+    "What a worker serves from: each book's top K kept as flat arrays, not per-entry Python objects."
+    loans: object  # csr_matrix, users x books
+    books: object  # sorted book ids that have a list
+    indptr: object  # list of books[i] is ids/scores[indptr[i]:indptr[i + 1]]
+    ids: object
+    scores: object
+    popular: object
+    watermark: int
+    built_at: float
+    loaded_at: float = field(default_factory=time.time)
+
+def load_model(path: str, k: int = RECOMMENDATIONS_TOP_K) -> Model:
+    import numpy as np
+    loans, arrays = _load_arrays(path)
+    indptr = arrays["related_indptr"]
+    lengths = np.diff(indptr)
+    # Keep the first k entries of every list
+    position = np.arange(indptr[-1]) - np.repeat(indptr[:-1], lengths)
+    keep = position < k
+    watermark, built_at = arrays["meta"].tolist()
+    return Model(
+        loans, arrays["related_books"], np.concatenate(([0], np.cumsum(np.minimum(lengths, k)))),
+        arrays["related_ids"][keep], arrays["related_scores"][keep], arrays["popular"], int(watermark), built_at,
+    )
+
+class Recommender:
+    "Per-worker view of the latest artifact; requests only read the loaded model."
+
+    def __init__(self):
+        self.model: Model | None = None
+        self._mtime: float | None = None
+        self._lock = threading.Lock()  # one load at a time
+        self.stats_data = {"loads": 0, "last_load_s": None, "load_error": None}
+
+    def reload(self, path: str) -> bool:
+        "Load the artifact at `path` if it changed since the last load. Returns whether it loaded."
+        with self._lock:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            started = time.perf_counter()
+            self.model = load_model(path)
+            self._mtime = mtime
+            self.stats_data.update(loads=self.stats_data["loads"] + 1, last_load_s=round(time.perf_counter() - started, 3), load_error=None)
+            return True
+
+    def _current(self) -> Model:
+        model = self.model
+        if model is None:
+            raise RecommendationsNotReady()
+        return model
+
+    @staticmethod
+    def _row(model: Model, book_id: int):
+        import numpy as np
+        row = int(np.searchsorted(model.books, book_id))
+        if row == len(model.books) or model.books[row] != book_id:
+            return model.ids[:0], model.scores[:0]
+        lo, hi = model.indptr[row], model.indptr[row + 1]
+        return model.ids[lo:hi], model.scores[lo:hi]
+
+    def related(self, book_id: int, limit: int) -> list[tuple[int, float]]:
+        ids, scores = self._row(self._current(), book_id)
+        return list(zip(ids[:limit].tolist(), scores[:limit].tolist()))
+
+    def for_user(self, user_id: int, limit: int) -> list[tuple[int, float]]:
+        "Books scored by summed similarity to what the user borrowed; popular books if there's nothing to go on."
+        import numpy as np
+        model = self._current()
+        borrowed = model.loans.indices[:0]
+        if user_id < model.loans.shape[0]:
+            borrowed = model.loans.indices[model.loans.indptr[user_id]:model.loans.indptr[user_id + 1]]
+        rows = [self._row(model, int(book_id)) for book_id in borrowed]
+        if rows:
+            ids = np.concatenate([ids for ids, _ in rows])
+            scores = np.concatenate([scores for _, scores in rows])
+            keep = ~np.isin(ids, borrowed)
+            candidates, inverse = np.unique(ids[keep], return_inverse=True)
+            if len(candidates):
+                totals = np.round(np.bincount(inverse, weights=scores[keep]), 6)
+                order = np.lexsort((candidates, -totals))[:limit]  # best score first, ties by id
+                return [(int(candidates[i]), float(totals[i])) for i in order]
+        popular = model.popular[~np.isin(model.popular, borrowed)][:limit]
+        return [(int(book_id), 0.0) for book_id in popular]
+
+    def stats(self) -> dict:
+        model = self.model
+        return {
+            **self.stats_data,
+            "ready": model is not None,
+            "books": len(model.books) if model else 0,
+            "loans": int(model.loans.nnz) if model else 0,
+            "watermark": model.watermark if model else None,
+            "age_s": round(time.time() - model.built_at) if model else None,
+        }
+
+recommender = Recommender()
+
+def load_books(db: Session, scored: list[tuple[int, float]]) -> list[dict]:
+    "Book details for (book id, score) pairs, in the same order; books deleted since the build are skipped."
+    from ..models import Book
+    from ..schemas import BookResponse
+    from .fastjson import projection, row_dicts
+    if not scored:
+        return []
+    rows = db.query(*projection(Book, BookResponse)).filter(Book.id.in_([book_id for book_id, _ in scored])).all()
+    books = {book["id"]: book for book in row_dicts(rows, BookResponse)}
+    return [{**books[book_id], "score": score} for book_id, score in scored if book_id in books]
+
+async def recommendation_loader(path: str = RECOMMENDATIONS_PATH, interval: float = RECOMMENDATIONS_RELOAD_INTERVAL):
+    "Background loop started from the app lifespan: load the artifact, then pick up new ones."
+    while True:
+        try:
+            await asyncio.to_thread(recommender.reload, path)
+        except Exception as exc:
+            recommender.stats_data["load_error"] = str(exc)
+            logger.exception("Loading recommendations from %s failed", path)
+        await asyncio.sleep(interval)
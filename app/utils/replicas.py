@@ -0,0 +1,112 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("app.db")
+
+# Seconds between health checks of each replica
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+# Replicas further behind the primary than this are skipped
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.lag: float | None = None
+        self.checked_at = 0.0
+        self.error: str | None = None
+        self._checking = threading.Lock()
+
+    def check(self):
+        "Probe the replica; marks it unhealthy if unreachable, stopped, or lagging."
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "mysql":
+                    status = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+                    self.lag = None if status is None else status.get("Seconds_Behind_Source")
+                    # NULL lag means replication is stopped or broken
+                    self.healthy = self.lag is not None and self.lag <= DB_REPLICA_MAX_LAG
+                    self.error = None if self.healthy else f"lag {self.lag}"
+                else:
+                    # Stand-ins such as a second SQLite file have no replication to measure
+                    conn.execute(text("SELECT 1"))
+                    self.healthy, self.error = True, None
+        except Exception as exc:
+            self.healthy, self.error = False, str(exc)
+        if not self.healthy:
+            logger.warning("replica %s unavailable: %s", self.engine.url.render_as_string(hide_password=True), self.error)
+        self.checked_at = time.monotonic()
+
+    def available(self) -> bool:
+        # Re-check at most once per interval, from whichever request gets here first
+        if time.monotonic() - self.checked_at >= DB_REPLICA_CHECK_INTERVAL and self._checking.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._checking.release()
+        return self.healthy
+
+class ReplicaSet:
+    "Read replicas picked round-robin, skipping any that failed their last health check."
+
+    def __init__(self, engines):
+        self.replicas = [Replica(engine) for engine in engines]
+        self._next = itertools.count()
+        for replica in self.replicas:
+            event.listen(replica.engine, "handle_error", self._on_error(replica))
+
+    @staticmethod
+    def _on_error(replica: Replica):
+        def handle_error(context):
+            # A dropped connection takes the replica out until its next successful check
+            if context.is_disconnect:
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+        return handle_error
+
+    def pick(self):
+        "An engine for a read-only session, or None to use the primary."
+        count = len(self.replicas)
+        start = next(self._next)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.available():
+                return replica.engine
+        return None
+
+    def status(self) -> list[dict]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "lag": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
+
+class RoutingSession(Session):
+    """Session that reads from `info["replica"]` until it writes.
+
+    Flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE go to the primary,
+    and once the session has written, every later statement does too, so a
+    request always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if self._flushing or (clause is not None and (clause.is_dml or getattr(clause, "_for_update_arg", None) is not None)):
+            self.info["replica"] = None
+            return super().get_bind(mapper, clause=clause, **kw)
+        return replica
+
+def use_primary(db: Session):
+    "Send this session's remaining statements to the primary."
+    db.info["replica"] = None
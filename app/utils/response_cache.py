@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from fastapi import Request, Response
+from .cache import TTLCache
+
+@dataclass(frozen=True)
+class CachedResponse:
+    version: int
+    etag: str
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+class VersionedResponseCache:
+    """Rendered JSON responses stamped with a version that writes bump.
+
+    Concurrent misses on the same key are single-flighted: one caller renders,
+    the rest wait for its entry. The TTL bounds staleness from writes made by
+    other workers, which can't bump this process's version.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.version = 0
+        self._entries = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self._inflight: dict = {}  # key -> threading.Event (sync callers)
+        self._async_inflight: dict = {}  # key -> asyncio.Future (async callers, one loop per worker)
+
+    def bump(self):
+        "Invalidate every entry rendered before now."
+        with self._lock:
+            self.version += 1
+
+    def stats(self) -> dict:
+        return {"version": self.version, **self._entries.stats()}
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == self.version:
+            return entry
+        return None
+
+    def _store(self, key, version: int, body: bytes, headers: dict[str, str]) -> CachedResponse:
+        entry = CachedResponse(version, strong_etag(body), body, headers)
+        with self._lock:
+            # Don't keep a render that raced with a write
+            if self.version == version:
+                self._entries.set(key, entry)
+        return entry
+
+    def get_or_compute(self, key, compute) -> CachedResponse:
+        "Return the cached entry for key, or render it with compute() -> (body, headers)."
+        while True:
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    return entry
+                version = self.version
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = threading.Event()
+            if not leader:
+                flight.wait()
+                continue
+            try:
+                body, headers = compute()
+                return self._store(key, version, body, headers)
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                flight.set()
+
+    async def aget_or_compute(self, key, compute) -> CachedResponse:
+        "Async variant of get_or_compute, for routes on the async engine."
+        while True:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry
+            version = self.version
+            flight = self._async_inflight.get(key)
+            if flight is not None:
+                await asyncio.shield(flight)
+                continue
+            flight = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+            try:
+                body, headers = await compute()
+                return self._store(key, version, body, headers)
+            finally:
+                del self._async_inflight[key]
+                flight.set_result(None)
+
+def request_key(request: Request) -> tuple:
+    "Cache key for a GET: path plus normalized query string."
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+def conditional_response(request: Request, entry: CachedResponse) -> Response:
+    "200 with the cached body, or 304 when the client already has this ETag."
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# GET /books/ and GET /books/{id}; bumped by every write that changes a book row.
+# Misses render from the primary (see use_primary): an entry outlives the request that
+# rendered it, so one read from a lagging replica would be served as current to everyone.
+catalog_cache = VersionedResponseCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "30")),
+)
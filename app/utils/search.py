@@ -0,0 +1,165 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from ..models import Book
+
+TITLE_WEIGHT = 2
+AUTHOR_WEIGHT = 1
+# Upper bound on how many indexed tokens a trailing prefix may expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+_token_pattern = re.compile(r"\w+")
+
+def tokenize(text: str | None) -> list[str]:
+    "Split text into lowercase word tokens."
+    if not text:
+        return []
+    return _token_pattern.findall(text.lower())
+
+
+class InvertedIndex:
+    "In-process inverted index over book titles and authors, used when the database has no FULLTEXT support."
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[int, int]] = {}  # token -> {book_id: weight}
+        self._doc_tokens: dict[int, set[str]] = {}
+        self._doc_isbn: dict[int, str] = {}
+        self._isbn: dict[str, int] = {}
+        self._tokens: list[str] = []  # sorted, for prefix lookups
+        self.ready = False
+
+    def build(self, rows):
+        "Replace the index contents with (id, title, author, isbn) rows."
+        with self._lock:
+            self.clear()
+            for book_id, title, author, isbn in rows:
+                self._add(book_id, title, author, isbn)
+            self.ready = True
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._doc_isbn.clear()
+            self._isbn.clear()
+            self._tokens.clear()
+            self.ready = False
+
+    def add(self, book: Book):
+        "Index (or re-index) a single book. Ignored until the index has been built."
+        with self._lock:
+            if not self.ready:
+                return
+            self._remove(book.id)
+            self._add(book.id, book.title, book.author, book.isbn)
+
+    def remove(self, book_id: int):
+        with self._lock:
+            if self.ready:
+                self._remove(book_id)
+
+    def search(self, q: str, limit: int) -> list[int]:
+        "Return up to `limit` book ids ranked by relevance to `q`."
+        tokens = tokenize(q)
+        with self._lock:
+            isbn_hit = self._isbn.get(q.strip())
+            scores: dict[int, float] = {}
+            matched: dict[int, int] = {}
+            for position, token in enumerate(tokens):
+                hits = dict(self._postings.get(token, {}))
+                # Treat the last token as a prefix so partially typed words still match
+                if position == len(tokens) - 1:
+                    for candidate in self._expand_prefix(token):
+                        for book_id, weight in self._postings[candidate].items():
+                            hits.setdefault(book_id, weight / 2)
+                for book_id, weight in hits.items():
+                    scores[book_id] = scores.get(book_id, 0) + weight
+                    matched[book_id] = matched.get(book_id, 0) + 1
+
+        ranked = sorted(scores, key=lambda book_id: (-matched[book_id], -scores[book_id], book_id))
+        if isbn_hit is not None:
+            ranked = [isbn_hit] + [book_id for book_id in ranked if book_id != isbn_hit]
+        return ranked[:limit]
+
+    def _add(self, book_id, title, author, isbn):
+        weights: dict[str, int] = {}
+        for token in tokenize(title):
+            weights[token] = weights.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(author):
+            weights[token] = weights.get(token, 0) + AUTHOR_WEIGHT
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._tokens, token)
+            postings[book_id] = weight
+        self._doc_tokens[book_id] = set(weights)
+        if isbn:
+            self._doc_isbn[book_id] = isbn
+            self._isbn[isbn] = book_id
+
+    def _remove(self, book_id):
+        for token in self._doc_tokens.pop(book_id, ()):
+            postings = self._postings[token]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+        isbn = self._doc_isbn.pop(book_id, None)
+        if isbn is not None and self._isbn.get(isbn) == book_id:
+            del self._isbn[isbn]
+
+    def _expand_prefix(self, prefix: str) -> list[str]:
+        start = bisect_left(self._tokens, prefix)
+        expansions = []
+        for token in self._tokens[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            if token != prefix:
+                expansions.append(token)
+        return expansions
+
+
+# Process-wide fallback index, kept current by the book routes
+catalog_index = InvertedIndex()
+
+def search_books(db: Session, q: str, limit: int) -> list[Book]:
+    "Ranked catalog search: exact ISBN first, then title/author relevance."
+    if db.get_bind().dialect.name == "mysql":
+        return _search_mysql(db, q, limit)
+
+    if not catalog_index.ready:
+        catalog_index.build(db.query(Book.id, Book.title, Book.author, Book.isbn))
+    ids = catalog_index.search(q, limit)
+    if not ids:
+        return []
+    books = {book.id: book for book in db.query(Book).filter(Book.id.in_(ids))}
+    return [books[book_id] for book_id in ids if book_id in books]
+
+def boolean_query(q: str) -> str:
+    """The MySQL boolean-mode form of `q`, matching what InvertedIndex.search matches.
+
+    Any word may match and the last one is a prefix ("dun" finds "Dune"); a
+    prefix term also finds words shorter than the server's minimum word length.
+    Tokenizing drops boolean operators typed by the user.
+    """
+    tokens = tokenize(q)
+    if not tokens:
+        return ""
+    return " ".join(tokens[:-1] + [tokens[-1] + "*"])
+
+def _search_mysql(db: Session, q: str, limit: int) -> list[Book]:
+    # Separate queries so each one can use its own index (unique ISBN, FULLTEXT title/author)
+    results = db.query(Book).filter(Book.isbn == q.strip()).all()
+    terms = boolean_query(q)
+    if not terms:
+        return results[:limit]
+    score = match(Book.title, Book.author, against=terms).in_boolean_mode()
+    seen = {book.id for book in results}
+    for book in db.query(Book).filter(score).order_by(score.desc()).limit(limit):
+        if book.id not in seen:
+            results.append(book)
+    return results[:limit]
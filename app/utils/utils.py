@@ -1,13 +1,45 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
+# bcrypt cost factor; hashes below it are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Dedicated bcrypt workers (bcrypt releases the GIL, so threads run in parallel)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashing jobs allowed to wait for a worker before callers get a 503
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(PASSWORD_HASH_WORKERS * 4)))
+
 # Creating a password context for hashing and verifying password
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    "Raised when the password hashing queue is full."
+
+async def _run_in_hash_pool(fn, *args):
+    # Awaited rather than blocked on, so a queued hash holds no request thread; past the
+    # queue limit callers are rejected instead of waiting without bound
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        return await asyncio.wrap_future(_hash_pool.submit(fn, *args))
+    finally:
+        _hash_slots.release()
 
 # function to hash a password coming from the user
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     "Hashing a password using bcrypt algo."
-    return pwd_context.hash(password)
+    return await _run_in_hash_pool(pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    "Verify if a plain password matches its hashed version."
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    "Verify a password and return a replacement hash if the stored one needs an upgrade."
+    return await _run_in_hash_pool(pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,105 @@
+"""Compare the list-route response paths on a seeded SQLite database.
+
+"orm" is the old path: load full entities, validate each through the response
+model with from_attributes, encode with jsonable_encoder + json.dumps (what
+FastAPI does for response_model routes). "fast" is the projected-rows + orjson
+path used by the routes now. Prints JSON with the best-of-N time per path.
+
+    python -m benchmarks.bench_list_serialization [--rows 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+
+def seed(engine, rows: int):
+    from app.db import Base
+    from app.models import User, Book, BorrowHistory
+
+    Base.metadata.create_all(engine)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"name": "u", "email": "u@example.com", "password": "x", "role": "user"}])
+        conn.execute(insert(Book), [
+            {"title": f"title {i}", "author": f"author {i % 500}", "isbn": f"isbn-{i}", "available_copies": 2}
+            for i in range(rows)
+        ])
+        conn.execute(insert(BorrowHistory), [
+            {
+                "user_id": 1,
+                "book_id": i + 1,
+                "start_date": start + timedelta(days=i % 365),
+                "end_date": start + timedelta(days=i % 365 + 14),
+                "status": "returned",
+            }
+            for i in range(rows)
+        ])
+
+
+def orm_path(db: Session, model, schema) -> bytes:
+    objects = db.query(model).order_by(model.id).all()
+    validated = [schema.model_validate(obj) for obj in objects]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(db: Session, model, schema) -> bytes:
+    from app.utils.fastjson import projection, render_rows
+
+    rows = db.query(*projection(model, schema)).order_by(model.id).all()
+    return render_rows(rows, schema)
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.rows:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        os.environ["DATABASE_URL"] = url
+        from app.models import Book, BorrowHistory
+        from app.schemas import BookResponse, BorrowHistoryResponse
+
+        engine = create_engine(url)
+        seed(engine, rows)
+        for model, schema in ((Book, BookResponse), (BorrowHistory, BorrowHistoryResponse)):
+            with Session(engine) as db:
+                # Both paths must produce the same document
+                assert json.loads(orm_path(db, model, schema)) == json.loads(fast_path(db, model, schema))
+                orm = best_of(args.repeat, orm_path, db, model, schema)
+                fast = best_of(args.repeat, fast_path, db, model, schema)
+            results.append({
+                "table": model.__tablename__,
+                "rows": rows,
+                "orm_s": round(orm, 4),
+                "fast_s": round(fast, 4),
+                "speedup": round(orm / fast, 2),
+            })
+        engine.dispose()
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
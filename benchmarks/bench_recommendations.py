@@ -0,0 +1,69 @@
+"""Time the recommendation model on a synthetic loan matrix.
+
+Loans are drawn with Zipf-like book popularity, so a few books have most of
+the readers, as in a real catalog. Reports the full build, then incremental
+updates of --batch new loans each. No database is involved.
+
+    python -m benchmarks.bench_recommendations [--users 200000] [--books 50000] [--loans 2000000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def synthetic_loans(rng, users: int, books: int, loans: int, skew: float):
+    weights = 1.0 / np.arange(1, books + 1) ** skew
+    book_ids = rng.choice(np.arange(1, books + 1), size=loans, p=weights / weights.sum())
+    user_ids = rng.integers(1, users + 1, size=loans)
+    return user_ids, book_ids
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--books", type=int, default=50_000)
+    parser.add_argument("--loans", type=int, default=2_000_000)
+    parser.add_argument("--skew", type=float, default=0.8)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # The app reads its configuration on import; the model itself never touches the database
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from app.utils.recommendations import build, update
+
+    rng = np.random.default_rng(args.seed)
+    users, books = synthetic_loans(rng, args.users, args.books, args.loans, args.skew)
+    started = time.perf_counter()
+    snapshot = build(users, books, args.loans)
+    build_s = time.perf_counter() - started
+
+    update_s, recomputed = [], []
+    watermark = args.loans
+    for _ in range(args.updates):
+        users, books = synthetic_loans(rng, args.users, args.books, args.batch, args.skew)
+        watermark += args.batch
+        started = time.perf_counter()
+        snapshot, touched = update(snapshot, users, books, watermark)
+        update_s.append(time.perf_counter() - started)
+        recomputed.append(touched)
+
+    json.dump({
+        "config": vars(args),
+        "distinct_loans": int(snapshot.loans.nnz),
+        "books_with_lists": len(snapshot.related),
+        "build_s": round(build_s, 3),
+        "update_s": [round(value, 3) for value in update_s],
+        "books_recomputed": recomputed,
+    }, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
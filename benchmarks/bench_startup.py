@@ -0,0 +1,82 @@
+"""Measure worker cold start: importing the app, running startup, and serving the first request.
+
+Each sample is a fresh interpreter, as a newly scaled-out worker would be. The
+"fresh" scenario starts against an empty database (the schema is migrated on
+startup); "current" starts against an already stamped one, which is the normal
+case. legacy_create_all_s times the create_all every boot used to run, on the
+same database, for comparison. Prints the median of --repeat samples as JSON.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--url mysql+pymysql://...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter
+CHILD = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    import httpx
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/books/?limit=10")
+            response.raise_for_status()
+        first = time.perf_counter()
+    return ready, first
+
+ready, first = asyncio.run(boot())
+
+from app.db import Base, get_engine
+legacy = time.perf_counter()
+Base.metadata.create_all(get_engine())
+done = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - imported,
+    "first_request_s": first - ready,
+    "total_s": first - started,
+    "legacy_create_all_s": done - legacy,
+}))
+"""
+
+def sample(url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=url, OVERDUE_SWEEP_INTERVAL="0", AUTO_MIGRATE="1")
+    env.setdefault("SECRET_KEY", "bench-secret-key-bench-secret-key-bench")
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def median(samples: list[dict]) -> dict:
+    return {key: round(statistics.median(s[key] for s in samples), 4) for key in samples[0]}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Database URL for the 'current' scenario (default: a SQLite file)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    fresh = []
+    for _ in range(args.repeat):
+        fresh.append(sample(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"))
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    sample(url)  # make sure the schema exists and is stamped
+    current = [sample(url) for _ in range(args.repeat)]
+
+    json.dump({"fresh": median(fresh), "current": median(current), "repeat": args.repeat}, sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Drive a mixed workload against the app in-process and report per-route latency.
+
+Seeds a fresh SQLite database (or uses --url as-is with --no-seed), then runs
+--clients concurrent virtual users through httpx's ASGI transport for
+--duration seconds. Each operation is picked at random from the mix (browse,
+search, login, request, approve, history). The report is JSON: throughput plus
+p50/p95/p99 latency per route, so runs can be diffed between commits.
+
+    python -m benchmarks.loadtest --clients 32 --duration 30 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+DEFAULT_MIX = "browse=40,book=15,search=10,login=5,request=10,approve=10,history=10"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    "Nearest-rank percentile of an ascending list."
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, client, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - start)
+        # 409 (no copies / already decided) is an expected outcome under contention
+        if response.status_code >= 400 and response.status_code != 409:
+            self.errors[label] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for label, values in sorted(self.latencies.items()):
+            values.sort()
+            routes[label] = {
+                "count": len(values),
+                "errors": self.errors[label],
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {
+            "total": {
+                "requests": total,
+                "errors": sum(self.errors.values()),
+                "elapsed_s": round(elapsed, 3),
+                "rps": round(total / elapsed, 2),
+            },
+            "routes": routes,
+        }
+
+
+async def login(client, email: str, password: str) -> dict:
+    response = await client.post("/user/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(args) -> dict:
+    import httpx
+    from app.main import app
+    from benchmarks.seed import user_email, librarian_email, PASSWORD
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    pending_ids = list(range(1, args.requests + 1, 4)) + list(range(2, args.requests + 1, 4))
+    rng.shuffle(pending_ids)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Sign in a pool of accounts up front so only the "login" op measures bcrypt
+        user_headers = [await login(client, user_email(i), PASSWORD) for i in range(min(args.users, 50))]
+        librarian_headers = [await login(client, librarian_email(i), PASSWORD) for i in range(args.librarians)]
+
+        ops = {
+            "browse": lambda: recorder.call(
+                client, "GET /books/", "GET", f"/books/?limit=50&after={rng.randrange(args.books)}"),
+            "book": lambda: recorder.call(
+                client, "GET /books/{id}", "GET", f"/books/{rng.randrange(1, args.books + 1)}"),
+            "search": lambda: recorder.call(
+                client, "GET /books/search", "GET", f"/books/search?q=Title {rng.randrange(args.books)}"),
+            "login": lambda: recorder.call(
+                client, "POST /user/token", "POST", "/user/token",
+                data={"username": user_email(rng.randrange(args.users)), "password": PASSWORD}),
+            "request": lambda: recorder.call(
+                client, "POST /borrow-requests/", "POST", "/borrow-requests/",
+                headers=rng.choice(user_headers),
+                json=_borrow_request(rng, args.books)),
+            "approve": lambda: recorder.call(
+                client, "PUT /borrow-requests/{id}", "PUT",
+                f"/borrow-requests/{pending_ids.pop() if pending_ids else 1}?status=approved",
+                headers=rng.choice(librarian_headers)),
+            "history": lambda: recorder.call(
+                client, "GET /borrow-history/me", "GET", "/borrow-history/me?limit=50",
+                headers=rng.choice(user_headers)),
+        }
+        names, weights = zip(*args.mix.items())
+
+        deadline = time.perf_counter() + args.duration
+
+        async def virtual_user():
+            while time.perf_counter() < deadline:
+                await ops[rng.choices(names, weights)[0]]()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+
+    return recorder.report(elapsed)
+
+
+def _borrow_request(rng, books: int) -> dict:
+    start = date(2027, 1, 1) + timedelta(days=rng.randrange(365))
+    return {
+        "book_id": rng.randrange(1, books + 1),
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=14)).isoformat(),
+    }
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Database URL (default: a fresh SQLite file)")
+    parser.add_argument("--no-seed", action="store_true", help="Use --url as-is instead of seeding it")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--librarians", type=int, default=5)
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--history", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    # The app reads its configuration on import, so set it first
+    os.environ["DATABASE_URL"] = url
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret-key-loadtest-secret-key")
+    os.environ.setdefault("OVERDUE_SWEEP_INTERVAL", "0")
+
+    if not args.no_seed:
+        from sqlalchemy import create_engine
+        from benchmarks.seed import seed
+        engine = create_engine(url)
+        seed(engine, args.users, args.librarians, args.books, args.requests, args.history)
+        engine.dispose()
+
+    report = asyncio.run(run(args))
+    report["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "url")
+    }
+    report["config"]["database"] = url.split(":", 1)[0]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Generate a deterministic library dataset at a configurable scale.
+
+    python -m benchmarks.seed --url sqlite:///./bench.db --users 1000 --books 5000 --requests 20000 --history 20000
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+
+BASE_DATE = datetime(2025, 1, 1)
+PASSWORD = "password"
+
+
+def user_email(i: int) -> str:
+    return f"user{i}@example.com"
+
+
+def librarian_email(i: int) -> str:
+    return f"librarian{i}@example.com"
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(engine, users=1000, librarians=5, books=5000, requests=20000, history=20000,
+         password_hash=None, batch_size=5000):
+    """Create the schema and insert the dataset with executemany batches.
+
+    User ids are 1..users, librarian ids follow, book ids are 1..books.
+    (user, start day) pairs are unique per table, so history rows never
+    collide on uq_borrow_history_loan.
+    """
+    from app.db import Base
+    from app.models import User, Book, BorrowRequest, BorrowHistory
+
+    if password_hash is None:
+        from app.utils.utils import pwd_context
+        # One hash shared by every account; hashing per user would dominate seeding time
+        password_hash = pwd_context.hash(PASSWORD)
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for batch in _batched(
+            ({"name": f"User {i}", "email": user_email(i), "password": password_hash, "role": "user"}
+             for i in range(users)), batch_size):
+            conn.execute(insert(User), batch)
+        conn.execute(insert(User), [
+            {"name": f"Librarian {i}", "email": librarian_email(i), "password": password_hash, "role": "librarian"}
+            for i in range(librarians)
+        ])
+        for batch in _batched(
+            ({"title": f"Title {i} volume {i % 97}", "author": f"Author {i % 1000}", "isbn": f"978{i:010d}",
+              "available_copies": 1 + i % 5}
+             for i in range(books)), batch_size):
+            conn.execute(insert(Book), batch)
+
+        def loans(count, statuses):
+            for i in range(count):
+                start = BASE_DATE + timedelta(days=i // users)
+                yield {
+                    "user_id": i % users + 1,
+                    "book_id": (i * 7919) % books + 1,
+                    "start_date": start,
+                    "end_date": start + timedelta(days=14),
+                    "status": statuses[i % len(statuses)],
+                }
+
+        for batch in _batched(loans(requests, ("pending", "pending", "approved", "denied")), batch_size):
+            conn.execute(insert(BorrowRequest), batch)
+        for batch in _batched(loans(history, ("returned", "returned", "borrowed", "overdue")), batch_size):
+            conn.execute(insert(BorrowHistory), batch)
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--librarians", type=int, default=5)
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--history", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.url
+    engine = create_engine(args.url)
+    seed(engine, args.users, args.librarians, args.books, args.requests, args.history)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
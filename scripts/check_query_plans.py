@@ -0,0 +1,128 @@
+"""Fail if the main query behind a route falls back to a full table scan.
+
+Seeds a throwaway SQLite database and runs EXPLAIN QUERY PLAN on each query.
+Pass --url to EXPLAIN against an existing database instead; that database is
+only read, never seeded.
+
+    python -m scripts.check_query_plans [--url mysql+pymysql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+def _plan_of(element, compiler, **kw) -> str:
+    sql = compiler.process(element.statement, **kw)
+    # The rows are plan lines, not the statement's columns, so don't apply its result types
+    compiler._result_columns = []
+    return sql
+
+
+@compiles(Explain)
+def _explain_default(element, compiler, **kw):
+    return "EXPLAIN " + _plan_of(element, compiler, **kw)
+
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + _plan_of(element, compiler, **kw)
+
+
+def route_queries():
+    "The main query behind each route, with the same projection and filters the route uses."
+    from app.models import User, Book, BorrowRequest, BorrowHistory
+    from app.schemas import BookResponse, UserResponse, BorrowRequestResponse, BorrowHistoryResponse
+    from app.utils.fastjson import projection
+    from app.utils.listing import keyset, filter_borrow_query
+    from app.jobs.archive import history_page
+
+    books = select(*projection(Book, BookResponse))
+    requests = select(*projection(BorrowRequest, BorrowRequestResponse))
+    history = select(*projection(BorrowHistory, BorrowHistoryResponse)).filter(
+        BorrowHistory.status.in_(["borrowed", "returned", "overdue"])
+    )
+    return {
+        "GET /books/": keyset(books, Book.id, 10, 100),
+        "GET /books/{id}": select(Book).filter(Book.id == 10),
+        "GET /books/search (isbn)": select(Book).filter(Book.isbn == "isbn-10"),
+        "POST /user/token": select(User).filter(User.email == "user1@example.com"),
+        "GET /user/": keyset(select(*projection(User, UserResponse)), User.id, 10, 100),
+        "GET /borrow-requests/ (status)": keyset(
+            filter_borrow_query(requests, BorrowRequest, status="pending"), BorrowRequest.id, 10, 100),
+        "GET /borrow-requests/ (book)": keyset(
+            filter_borrow_query(requests, BorrowRequest, book_id=10), BorrowRequest.id, 10, 100),
+        "GET /borrow-requests/me": keyset(
+            filter_borrow_query(requests, BorrowRequest, user_id=10), BorrowRequest.id, None, 100),
+        "GET /borrow-history/": keyset(history, BorrowHistory.id, 10, 100),
+        "GET /borrow-history/me": keyset(
+            filter_borrow_query(history, BorrowHistory, user_id=10), BorrowHistory.id, None, 100),
+        "GET /borrow-history/ (book)": keyset(
+            filter_borrow_query(history, BorrowHistory, book_id=10), BorrowHistory.id, None, 100),
+        "PUT /borrow-requests/{id} (loan lookup)": select(BorrowHistory).filter(
+            BorrowHistory.user_id == 10,
+            BorrowHistory.book_id == 10,
+            BorrowHistory.start_date == datetime(2025, 1, 10),
+        ),
+        "overdue sweep": select(BorrowHistory.id).where(
+            BorrowHistory.status == "borrowed", BorrowHistory.end_date < datetime(2025, 6, 1)
+        ).limit(500),
+        "history archive batch": select(BorrowHistory.id).where(
+            BorrowHistory.status == "returned", BorrowHistory.end_date < datetime(2025, 6, 1)
+        ).limit(1000),
+        "GET /borrow-history/user/{id}?include_archived": history_page(None, 10, None, None, None, None, 100),
+    }
+
+
+def full_scans(conn, dialect: str, statement) -> list[str]:
+    "Plan lines that read a whole table."
+    rows = conn.execute(Explain(statement)).mappings().all()
+    # Scans of derived tables (e.g. the pages merged for include_archived) read bounded subquery results, not tables
+    if dialect == "sqlite":
+        # "SCAN t" is a table scan; "SCAN t USING INDEX" / "SEARCH ..." are fine
+        return [
+            row["detail"] for row in rows
+            if row["detail"].startswith("SCAN") and "USING" not in row["detail"] and not row["detail"].startswith("SCAN anon_")
+        ]
+    return [
+        f"{row['table']}: type={row['type']}" for row in rows
+        if row["type"] == "ALL" and not str(row["table"]).startswith("<")
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="EXPLAIN against this database instead of a seeded SQLite file")
+    args = parser.parse_args(argv)
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+    # app.db reads DATABASE_URL on import and builds its engine from it on first use
+    os.environ["DATABASE_URL"] = url
+    engine = create_engine(url)
+    if not args.url:
+        from benchmarks.seed import seed
+        seed(engine, users=200, books=500, requests=5000, history=5000, password_hash="x")
+
+    failures = 0
+    with engine.connect() as conn:
+        for route, statement in route_queries().items():
+            scans = full_scans(conn, engine.dialect.name, statement)
+            print(f"{'FAIL' if scans else 'ok  '}  {route}" + "".join(f"\n        {scan}" for scan in scans))
+            failures += bool(scans)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+# The app reads its configuration on import, so point it at a throwaway SQLite file first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-test-secret-key-test")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["OVERDUE_SWEEP_INTERVAL"] = "0"
+os.environ.pop("RECOMMENDATIONS_PATH", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.pop("DB_ASYNC", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client():
+    "A client on an empty database; the app lifespan migrates it from scratch."
+    from app.main import app
+    from app.db import Base, get_engine
+    from app.dependencies import principal_cache
+    from app.utils.response_cache import catalog_cache
+
+    Base.metadata.drop_all(get_engine())
+    principal_cache.clear()  # user ids restart at 1
+    catalog_cache.bump()
+    with TestClient(app) as client:
+        yield client
+
+
+def _sign_up(client, email: str, role: str) -> dict:
+    client.post("/user/", json={"name": email.split("@")[0], "email": email, "password": "pw", "role": role})
+    token = client.post("/user/token", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def librarian(client) -> dict:
+    return _sign_up(client, "librarian@example.com", "librarian")
+
+
+@pytest.fixture
+def reader(client) -> dict:
+    return _sign_up(client, "reader@example.com", "user")
+
+
+@pytest.fixture
+def other_reader(client) -> dict:
+    return _sign_up(client, "other@example.com", "user")
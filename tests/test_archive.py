@@ -0,0 +1,96 @@
+"""Moving old returned loans to the archive and reading them back."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from test_borrow_approval import add_book, request_loan, decide, history
+
+NOW = datetime(2031, 1, 1)
+
+
+def add_history(rows: list[dict]):
+    from app.db import SessionLocal
+    from app.models import BorrowHistory
+
+    with SessionLocal() as db:
+        db.add_all(BorrowHistory(**row) for row in rows)
+        db.commit()
+
+
+def loan(day: int, status: str = "returned", age_days: int = 400) -> dict:
+    "A loan for user 1 that ended age_days before NOW; day keeps (user, book, start) unique."
+    end = NOW - timedelta(days=age_days)
+    return {"user_id": 1, "book_id": 1, "start_date": end - timedelta(days=10 + day), "end_date": end, "status": status}
+
+
+def ids(model) -> list[int]:
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        return list(db.scalars(select(model.id).order_by(model.id)))
+
+
+def test_returned_loans_move_in_batches_and_keep_their_ids(client):
+    from app.db import SessionLocal
+    from app.jobs.archive import archive_history
+    from app.models import BorrowHistory, BorrowHistoryArchive
+
+    add_history([loan(day) for day in range(5)] + [loan(5, age_days=30), loan(6, status="overdue")])
+    old = [1, 2, 3, 4, 5]
+
+    with SessionLocal() as db:
+        assert archive_history(db, 365, batch_size=2, now=NOW, max_batches=1) == 2
+        moved = ids(BorrowHistoryArchive)
+        assert len(moved) == 2 and set(moved) <= set(old)
+        assert archive_history(db, 365, batch_size=2, now=NOW) == 3
+
+    assert ids(BorrowHistoryArchive) == old
+    # Recently returned and unreturned loans stay
+    assert ids(BorrowHistory) == [6, 7]
+
+
+def test_include_archived_pages_across_both_tables(client, librarian):
+    from app.db import SessionLocal
+    from app.jobs.archive import archive_history
+
+    # Old returned loans interleaved with active ones, so every page mixes the two tables
+    add_history([loan(day, status="returned" if day % 2 else "borrowed") for day in range(7)])
+    with SessionLocal() as db:
+        assert archive_history(db, 365, now=NOW) == 3
+
+    seen, after = [], None
+    while True:
+        params = {"include_archived": "true", "limit": 2, **({"after": after} if after else {})}
+        response = client.get("/borrow-history/", params=params, headers=librarian)
+        page = [row["id"] for row in response.json()]
+        assert len(page) <= 2
+        seen += page
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+        assert int(after) == page[-1]
+
+    assert seen == list(range(1, 8))
+    assert [row["id"] for row in history(client, librarian)] == [1, 3, 5, 7]
+
+
+def test_withdrawing_an_archived_loan_is_a_conflict(client, librarian, reader):
+    from app.db import SessionLocal
+    from app.jobs.archive import archive_history
+    from app.models import BorrowHistoryArchive
+
+    book_id = add_book(client, librarian, copies=1)
+    request_id = request_loan(client, reader, book_id)
+    decide(client, librarian, request_id, "approved")
+    history_id = history(client, librarian)[0]["id"]
+    client.put(f"/borrow-history/{history_id}/return", headers=librarian)
+    with SessionLocal() as db:
+        assert archive_history(db, 365, now=NOW + timedelta(days=400)) == 1
+    assert ids(BorrowHistoryArchive) == [history_id]
+
+    response = decide(client, librarian, request_id, "denied")
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Loan is already returned"
+    assert client.get(f"/books/{book_id}").json()["available_copies"] == 1
+    assert client.get(f"/borrow-requests/{request_id}", headers=librarian).json()["status"] == "approved"
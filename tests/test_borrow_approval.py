@@ -0,0 +1,121 @@
+"""Approving, denying and withdrawing borrow requests: stock, history and rollups move together."""
+
+
+def add_book(client, librarian, copies: int, isbn: str = "isbn-1") -> int:
+    response = client.post("/books/", json={"title": "Dune", "author": "Frank Herbert", "isbn": isbn, "available_copies": copies}, headers=librarian)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def request_loan(client, reader, book_id: int, start: str = "2030-01-01", end: str = "2030-01-10") -> int:
+    response = client.post("/borrow-requests/", json={"book_id": book_id, "start_date": start, "end_date": end}, headers=reader)
+    assert response.status_code == 200, response.json()
+    return response.json()["id"]
+
+
+def copies(client, book_id: int) -> int:
+    return client.get(f"/books/{book_id}").json()["available_copies"]
+
+
+def history(client, librarian) -> list[dict]:
+    return client.get("/borrow-history/", headers=librarian).json()
+
+
+def total_loans(client, librarian, book_id: int) -> int:
+    rows = client.get("/reports/top-books", headers=librarian).json()
+    return next((row["total_loans"] for row in rows if row["book_id"] == book_id), 0)
+
+
+def decide(client, librarian, request_id: int, status: str):
+    return client.put(f"/borrow-requests/{request_id}?status={status}", headers=librarian)
+
+
+def test_approve_takes_a_copy_and_records_the_loan(client, librarian, reader):
+    book_id = add_book(client, librarian, copies=2)
+    request_id = request_loan(client, reader, book_id)
+
+    response = decide(client, librarian, request_id, "approved")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "approved"
+    assert copies(client, book_id) == 1
+    assert [row["status"] for row in history(client, librarian)] == ["borrowed"]
+    assert total_loans(client, librarian, book_id) == 1
+
+
+def test_approval_without_copies_is_rolled_back(client, librarian, reader, other_reader):
+    book_id = add_book(client, librarian, copies=1)
+    first = request_loan(client, reader, book_id)
+    second = request_loan(client, other_reader, book_id)
+    assert decide(client, librarian, first, "approved").status_code == 200
+
+    response = decide(client, librarian, second, "approved")
+
+    assert response.status_code == 409
+    assert client.get(f"/borrow-requests/{second}", headers=librarian).json()["status"] == "pending"
+    assert len(history(client, librarian)) == 1
+    assert copies(client, book_id) == 0
+    # Retrying through the batch route must not find a leftover history row to lean on
+    results = client.post("/borrow-requests/approve", json={"request_ids": [second], "status": "approved"}, headers=librarian).json()
+    assert results == [{"id": second, "ok": False, "status": "pending", "detail": "No copies available"}]
+    assert len(history(client, librarian)) == 1
+    assert total_loans(client, librarian, book_id) == 1
+
+
+def test_approving_a_loan_twice_is_a_conflict(client, librarian, reader):
+    book_id = add_book(client, librarian, copies=2)
+    first = request_loan(client, reader, book_id)
+    duplicate = request_loan(client, reader, book_id)
+    assert decide(client, librarian, first, "approved").status_code == 200
+
+    response = decide(client, librarian, duplicate, "approved")
+
+    assert response.status_code == 409
+    assert copies(client, book_id) == 1
+    assert len(history(client, librarian)) == 1
+    assert client.get(f"/borrow-requests/{duplicate}", headers=librarian).json()["status"] == "pending"
+
+
+def test_withdrawing_an_approval_returns_the_copy(client, librarian, reader):
+    book_id = add_book(client, librarian, copies=1)
+    request_id = request_loan(client, reader, book_id)
+    decide(client, librarian, request_id, "approved")
+
+    response = decide(client, librarian, request_id, "denied")
+
+    assert response.status_code == 200
+    assert copies(client, book_id) == 1
+    assert history(client, librarian) == []
+    assert total_loans(client, librarian, book_id) == 0
+
+
+def test_withdrawing_a_returned_loan_is_a_conflict(client, librarian, reader):
+    book_id = add_book(client, librarian, copies=1)
+    request_id = request_loan(client, reader, book_id)
+    decide(client, librarian, request_id, "approved")
+    history_id = history(client, librarian)[0]["id"]
+    assert client.put(f"/borrow-history/{history_id}/return", headers=librarian).status_code == 200
+
+    response = decide(client, librarian, request_id, "denied")
+
+    assert response.status_code == 409
+    assert copies(client, book_id) == 1
+    assert client.get(f"/borrow-requests/{request_id}", headers=librarian).json()["status"] == "approved"
+
+
+def test_batch_reports_each_result_and_keeps_the_successes(client, librarian, reader, other_reader):
+    book_id = add_book(client, librarian, copies=1)
+    first = request_loan(client, reader, book_id)
+    second = request_loan(client, other_reader, book_id)
+
+    response = client.post("/borrow-requests/approve", json={"request_ids": [first, 999, second], "status": "approved"}, headers=librarian)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": first, "ok": True, "status": "approved", "detail": None},
+        {"id": 999, "ok": False, "status": None, "detail": "Borrow request not found"},
+        {"id": second, "ok": False, "status": "pending", "detail": "No copies available"},
+    ]
+    assert copies(client, book_id) == 0
+    assert [row["user_id"] for row in history(client, librarian)] == [client.get("/user/me", headers=reader).json()["id"]]
+    assert total_loans(client, librarian, book_id) == 1
@@ -0,0 +1,87 @@
+"""Streamed catalog import: ISBN upserts, batches and per-line errors."""
+import json
+
+from sqlalchemy import select
+
+
+def import_csv(client, librarian, body: str, batch_size: int = 1000):
+    response = client.post(f"/books/bulk?batch_size={batch_size}", content=body.encode(), headers={**librarian, "Content-Type": "text/csv"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def import_ndjson(client, librarian, records: list, batch_size: int = 1000):
+    body = "\n".join(record if isinstance(record, str) else json.dumps(record) for record in records)
+    response = client.post(f"/books/bulk?format=ndjson&batch_size={batch_size}", content=body.encode(), headers=librarian)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def catalog() -> list[tuple]:
+    from app.db import SessionLocal
+    from app.models import Book
+
+    with SessionLocal() as db:
+        return db.execute(select(Book.title, Book.isbn, Book.available_copies).order_by(Book.id)).all()
+
+
+def test_repeated_isbns_in_a_batch_add_up(client, librarian):
+    report = import_csv(client, librarian, "title,author,isbn,available_copies\nDune,Herbert,i-1,2\nDune,Herbert,i-1,3\n")
+
+    assert report == {"processed": 2, "created": 1, "updated": 0, "failed": 0, "errors": []}
+    assert catalog() == [("Dune", "i-1", 5)]
+
+
+def test_existing_isbns_are_updated(client, librarian):
+    client.post("/books/", json={"title": "Dune", "author": "Herbert", "isbn": "i-1", "available_copies": 1}, headers=librarian)
+
+    report = import_ndjson(client, librarian, [
+        {"title": "Dune", "author": "Herbert", "isbn": "i-1", "available_copies": 4},
+        {"title": "Emma", "author": "Austen", "isbn": "i-2"},
+    ])
+
+    assert (report["created"], report["updated"]) == (1, 1)
+    assert catalog() == [("Dune", "i-1", 5), ("Emma", "i-2", 1)]
+
+
+def test_rows_without_an_isbn_are_always_new(client, librarian):
+    report = import_csv(client, librarian, "title,author,isbn,available_copies\nZine,Anon,,1\nZine,Anon,,2\n")
+
+    assert (report["created"], report["updated"]) == (2, 0)
+    assert catalog() == [("Zine", None, 1), ("Zine", None, 2)]
+
+
+def test_bad_lines_are_reported_with_their_line_numbers(client, librarian):
+    csv_report = import_csv(client, librarian, (
+        "title,author,isbn,available_copies\n"
+        "Dune,Herbert,i-1,2\n"
+        "Short,row\n"
+        "\n"
+        "Emma,Austen,i-2,many\n"
+    ))
+    assert csv_report["processed"] == 3 and csv_report["failed"] == 2
+    assert [error["line"] for error in csv_report["errors"]] == [3, 5]
+    assert csv_report["errors"][0]["error"] == "Expected 4 columns, got 2"
+    assert csv_report["errors"][1]["error"].startswith("available_copies:")
+
+    ndjson_report = import_ndjson(client, librarian, [
+        {"title": "Emma", "author": "Austen", "isbn": "i-2"},
+        "{not json",
+        "[1, 2]",
+        {"author": "Nobody"},
+    ])
+    assert [error["line"] for error in ndjson_report["errors"]] == [2, 3, 4]
+    assert ndjson_report["errors"][0]["error"].startswith("Invalid JSON")
+    assert ndjson_report["errors"][1]["error"] == "Expected a JSON object"
+    assert ndjson_report["errors"][2]["error"].startswith("title:")
+    assert catalog() == [("Dune", "i-1", 2), ("Emma", "i-2", 1)]
+
+
+def test_an_isbn_split_across_batches_is_created_then_updated(client, librarian):
+    body = "title,author,isbn,available_copies\n" + "".join(f"Book {n},A,i-{n % 2},1\n" for n in range(5))
+
+    report = import_csv(client, librarian, body, batch_size=2)
+
+    # Batches [i-0, i-1], [i-0, i-1], [i-0]: each ISBN is created once and then added to
+    assert report == {"processed": 5, "created": 2, "updated": 3, "failed": 0, "errors": []}
+    assert catalog() == [("Book 0", "i-0", 3), ("Book 1", "i-1", 2)]
@@ -0,0 +1,32 @@
+"""Rebuilding the circulation rollups from history."""
+from datetime import datetime
+
+from test_borrow_approval import add_book, request_loan, decide
+
+
+def test_rebuild_keeps_counts_history_cannot_reproduce(client, librarian, reader):
+    from app.db import SessionLocal
+    from app.models import BookCirculation, BorrowHistory, MonthlyCirculation
+    from app.utils.circulation import rebuild, record_overdue, record_return
+
+    book_id = add_book(client, librarian, copies=2)
+    decide(client, librarian, request_loan(client, reader, book_id), "approved")
+    with SessionLocal() as db:
+        loan = db.query(BorrowHistory).one()
+        # Went overdue in March, came back in April
+        loan.status = "overdue"
+        record_overdue(db, [(loan.user_id, book_id)], when=datetime(2030, 3, 5))
+        loan.status = "returned"
+        record_return(db, loan.user_id, book_id, was_overdue=True, returned_at=datetime(2030, 4, 2))
+        db.commit()
+        before = client.get("/reports/overdue-rate", headers=librarian).json()
+
+        rebuild(db)
+
+        row = db.get(BookCirculation, book_id)
+        assert (row.total_loans, row.active_loans, row.overdue_loans, row.total_overdues) == (1, 0, 0, 1)
+        months = {month.month: (month.loans, month.returns, month.overdues) for month in db.query(MonthlyCirculation)}
+        assert months == {"2030-01": (1, 0, 0), "2030-03": (0, 0, 1), "2030-04": (0, 1, 0)}
+    assert client.get("/reports/overdue-rate", headers=librarian).json() == before == {
+        "loans": 1, "overdues": 1, "overdue_rate": 1.0, "currently_overdue": 0,
+    }
@@ -0,0 +1,56 @@
+"""Adopting databases created before schema versioning."""
+from datetime import datetime
+
+from sqlalchemy import MetaData, create_engine, insert, inspect, select, func
+
+
+def create_pre_series_schema(engine):
+    "The four original tables, without the indexes and constraints added since."
+    from app.db import Base
+
+    metadata = MetaData()
+    for name in ("users", "books", "borrow_requests", "borrow_history"):
+        table = Base.metadata.tables[name].to_metadata(metadata)
+        for index in list(table.indexes):
+            if index.name.startswith(("ix_borrow_", "ft_")):
+                table.indexes.discard(index)
+        for constraint in list(table.constraints):
+            if constraint.name == "uq_borrow_history_loan":
+                table.constraints.discard(constraint)
+    metadata.create_all(engine)
+
+
+def test_unversioned_database_gets_every_step(tmp_path):
+    from app.migrations import SCHEMA_VERSION, current_version, migrate
+    from app.models import Book, BookCirculation, BorrowHistory, User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    create_pre_series_schema(engine)
+    loan = {"user_id": 1, "book_id": 1, "start_date": datetime(2025, 1, 1), "end_date": datetime(2025, 1, 10), "status": "borrowed"}
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"name": "u", "email": "u@example.com", "password": "x", "role": "user"}])
+        conn.execute(insert(Book), [{"title": "t", "author": "a", "isbn": "i", "available_copies": 1}])
+        conn.execute(insert(BorrowHistory), [loan, loan])  # recorded twice by the old approval route
+
+    assert migrate(engine) == (None, SCHEMA_VERSION)
+
+    assert current_version(engine) == SCHEMA_VERSION
+    inspector = inspect(engine)
+    history_indexes = {index["name"] for index in inspector.get_indexes("borrow_history")}
+    assert {"uq_borrow_history_loan", "ix_borrow_history_user_status", "ix_borrow_history_status_end_date"} <= history_indexes
+    assert "ix_borrow_requests_status_id" in {index["name"] for index in inspector.get_indexes("borrow_requests")}
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(BorrowHistory)) == 1
+        assert conn.execute(select(BookCirculation.total_loans, BookCirculation.active_loans)).all() == [(1, 1)]
+    # Current databases do no DDL
+    assert migrate(engine) == (SCHEMA_VERSION, SCHEMA_VERSION)
+    engine.dispose()
+
+
+def test_empty_database_is_built_from_the_models(tmp_path):
+    from app.migrations import SCHEMA_VERSION, migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert migrate(engine) == (None, SCHEMA_VERSION)
+    assert "uq_borrow_history_loan" in {constraint["name"] for constraint in inspect(engine).get_unique_constraints("borrow_history")}
+    engine.dispose()
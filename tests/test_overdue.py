@@ -0,0 +1,75 @@
+"""The overdue sweep: which loans it moves, in what batches, and the rollups it keeps."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+NOW = datetime(2030, 6, 10, 15, 30)
+
+
+def add_loans(ends: list[datetime], status: str = "borrowed"):
+    from app.db import SessionLocal
+    from app.models import BorrowHistory
+
+    with SessionLocal() as db:
+        db.add_all(
+            BorrowHistory(user_id=1 + n % 2, book_id=1 + n % 3, start_date=end - timedelta(days=10 + n), end_date=end, status=status)
+            for n, end in enumerate(ends)
+        )
+        db.commit()
+
+
+def statuses() -> dict[int, str]:
+    from app.db import SessionLocal
+    from app.models import BorrowHistory
+
+    with SessionLocal() as db:
+        return dict(db.execute(select(BorrowHistory.id, BorrowHistory.status)).all())
+
+
+def test_loans_go_overdue_once_their_last_day_is_over(client):
+    from app.db import SessionLocal
+    from app.jobs.overdue import sweep_overdue
+
+    today, yesterday = datetime(2030, 6, 10), datetime(2030, 6, 9)
+    add_loans([today, yesterday, yesterday + timedelta(hours=23)])
+    add_loans([yesterday], status="returned")
+
+    with SessionLocal() as db:
+        assert sweep_overdue(db, now=NOW) == 2
+
+    assert statuses() == {1: "borrowed", 2: "overdue", 3: "overdue", 4: "returned"}
+
+
+def test_sweep_works_in_chunks_and_keeps_the_rollups_in_step(client, monkeypatch):
+    from app.db import SessionLocal
+    from app.jobs import overdue
+    from app.models import BookCirculation, UserCirculation
+
+    add_loans([datetime(2030, 6, 1)] * 5)
+    chunks = []
+    record = overdue.record_overdue
+    monkeypatch.setattr(overdue, "record_overdue", lambda db, loans, when: (chunks.append(len(loans)), record(db, loans, when)))
+
+    with SessionLocal() as db:
+        assert overdue.sweep_overdue(db, now=NOW, chunk_size=2) == 5
+        assert chunks == [2, 2, 1]
+        assert sum(db.scalars(select(BookCirculation.overdue_loans))) == 5
+        assert sum(db.scalars(select(UserCirculation.overdue_loans))) == 5
+        assert dict(db.execute(select(BookCirculation.book_id, BookCirculation.total_overdues)).all()) == {1: 2, 2: 2, 3: 1}
+        # Nothing left to move
+        assert overdue.sweep_overdue(db, now=NOW) == 0
+    assert set(statuses().values()) == {"overdue"}
+
+
+def test_a_second_sweep_is_skipped_while_one_runs(client):
+    from app.db import SessionLocal
+    from app.jobs.locks import job_lock
+    from app.jobs.overdue import LOCK_NAME, sweep_overdue
+
+    add_loans([datetime(2030, 6, 1)])
+    with SessionLocal() as holder, SessionLocal() as db:
+        with job_lock(holder, LOCK_NAME) as acquired:
+            assert acquired
+            assert sweep_overdue(db, now=NOW) is None
+        assert statuses() == {1: "borrowed"}
+        assert sweep_overdue(db, now=NOW) == 1
@@ -0,0 +1,46 @@
+"""Revoking cached principals."""
+
+
+def test_deleting_a_user_revokes_their_token(client, librarian, reader):
+    user_id = client.get("/user/me", headers=reader).json()["id"]
+
+    assert client.delete(f"/user/{user_id}", headers=librarian).status_code == 200
+
+    assert client.get("/user/me", headers=reader).status_code == 401
+
+
+def test_revocations_from_other_workers_clear_the_cache(client):
+    from app.dependencies import Principal, principal_cache
+    from app.utils.events import event_bus
+
+    principal_cache.set(99, Principal(id=99, name="gone", email="gone@example.com", role="user"))
+
+    # What the Redis listener hands over when another worker deletes user 99
+    event_bus.dispatch({"type": "principal_revoked", "user_id": 99})
+
+    assert principal_cache.get(99) is None
+
+
+def test_a_revocation_during_the_lookup_is_not_undone(client, reader):
+    from app.db import SessionLocal
+    from app.dependencies import get_current_user, principal_cache, revoke_principal
+
+    user_id = client.get("/user/me", headers=reader).json()["id"]
+    principal_cache.clear()
+
+    class RevokedMidLookup:
+        "A session whose user lookup is followed by delete_user committing and revoking."
+
+        def __init__(self, db):
+            self.db = db
+
+        def query(self, *entities):
+            user = self.db.query(*entities)
+            revoke_principal(user_id)
+            return user
+
+    with SessionLocal() as db:
+        principal = get_current_user(reader["Authorization"].split()[1], RevokedMidLookup(db))
+
+    assert principal.id == user_id
+    assert principal_cache.get(user_id) is None
@@ -0,0 +1,23 @@
+"""The main query behind each route is served from an index, never a full table scan."""
+import pytest
+from sqlalchemy import create_engine
+
+from scripts.check_query_plans import full_scans, route_queries
+
+ROUTES = list(route_queries())
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    from benchmarks.seed import seed
+
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    seed(engine, users=200, books=500, requests=5000, history=5000, password_hash="x")
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_query_uses_an_index(seeded, route):
+    assert full_scans(seeded, "sqlite", route_queries()[route]) == []
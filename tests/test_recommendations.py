@@ -0,0 +1,28 @@
+"""The recommendation artifact: what the CLI writes is what workers serve."""
+
+
+def test_artifact_round_trip_and_serving(tmp_path):
+    from app.utils.recommendations import Recommender, build, load_snapshot, save
+
+    # Readers 1 and 2 share books 1 and 2; reader 3 only has book 3
+    users, books = [1, 1, 2, 2, 3], [1, 2, 1, 2, 3]
+    snapshot = build(users, books, watermark=5)
+    path = str(tmp_path / "model.npz")
+    save(snapshot, path)
+
+    restored = load_snapshot(path)
+    assert restored.related == snapshot.related
+    assert restored.watermark == 5
+
+    recommender = Recommender()
+    assert recommender.reload(path) is True
+    assert recommender.reload(path) is False  # unchanged file
+    assert recommender.related(1, 10) == [(2, 1.0)]
+    assert recommender.for_user(1, 10) == [(book_id, 0.0) for book_id in snapshot.popular if book_id not in (1, 2)]
+    assert recommender.for_user(99, 2) == [(book_id, 0.0) for book_id in snapshot.popular[:2]]
+
+
+def test_routes_are_unavailable_without_a_model(client, librarian, reader):
+    book_id = client.post("/books/", json={"title": "t", "author": "a", "isbn": "i", "available_copies": 1}, headers=librarian).json()["id"]
+    assert client.get(f"/books/{book_id}/related").status_code == 503
+    assert client.get("/user/me/recommendations", headers=reader).status_code == 503
@@ -0,0 +1,36 @@
+"""Read routing with a replica that lags behind the primary."""
+import pytest
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def lagging_replica(client, tmp_path, monkeypatch):
+    "Route reads without the sticky cookie to an empty database that never catches up."
+    import app.db as db_module
+    from app.db import Base, SessionLocal
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(engine)
+
+    def read_session():
+        db = SessionLocal()
+        db.info["replica"] = engine
+        return db
+
+    monkeypatch.setattr(db_module, "DATABASE_REPLICA_URLS", ["lagging"])
+    monkeypatch.setattr(db_module, "read_session", read_session)
+    yield engine
+    engine.dispose()
+
+
+def test_catalog_cache_misses_render_from_the_primary(client, librarian, lagging_replica):
+    from test_borrow_approval import add_book
+
+    book_id = add_book(client, librarian, copies=1)
+    # A client that never wrote: no db_primary cookie, so its reads go to the replica
+    client.cookies.clear()
+
+    assert client.get(f"/books/{book_id}").status_code == 200
+    assert [book["id"] for book in client.get("/books/").json()] == [book_id]
+    # Borrow lists are not cached and still read the replica
+    assert client.get("/borrow-requests/", headers=librarian).json() == []
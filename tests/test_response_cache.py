@@ -0,0 +1,78 @@
+"""Catalog ETags: 304 while nothing changed, a new tag after every write that touches books."""
+import pytest
+
+from test_borrow_approval import add_book, request_loan, decide, history
+
+
+def etag(client, path: str) -> str:
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_matching_etag_gets_an_empty_304(client, librarian):
+    book_id = add_book(client, librarian, copies=1)
+    for path in ("/books/", f"/books/{book_id}"):
+        tag = etag(client, path)
+
+        response = client.get(path, headers={"If-None-Match": tag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == tag
+        assert client.get(path, headers={"If-None-Match": '"other", ' + tag}).status_code == 304
+        assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def create(client, librarian, book_id, request_id):
+    add_book(client, librarian, copies=1, isbn="isbn-2")
+
+def update(client, librarian, book_id, request_id):
+    client.put(f"/books/{book_id}", json={"title": "Dune", "author": "Frank Herbert", "isbn": "isbn-1", "available_copies": 5}, headers=librarian)
+
+def delete(client, librarian, book_id, request_id):
+    client.delete(f"/books/{book_id + 1}", headers=librarian)
+
+def approve(client, librarian, book_id, request_id):
+    decide(client, librarian, request_id, "approved")
+
+def approve_batch(client, librarian, book_id, request_id):
+    client.post("/borrow-requests/approve", json={"request_ids": [request_id], "status": "approved"}, headers=librarian)
+
+def give_back(client, librarian, book_id, request_id):
+    client.put(f"/borrow-history/{history(client, librarian)[0]['id']}/return", headers=librarian)
+
+def bulk_import(client, librarian, book_id, request_id):
+    client.post("/books/bulk", content=b"title,author,isbn\nEmma,Austen,isbn-3\n", headers={**librarian, "Content-Type": "text/csv"})
+
+
+# Strong ETags hash the body, so only the responses the write changed get a new tag
+LIST, BOOK = "/books/", "/books/{id}"
+
+@pytest.mark.parametrize("write, changed", [
+    (create, {LIST}),
+    (update, {LIST, BOOK}),
+    (delete, {LIST}),
+    (approve, {LIST, BOOK}),
+    (approve_batch, {LIST, BOOK}),
+    (give_back, {LIST, BOOK}),
+    (bulk_import, {LIST}),
+])
+def test_every_book_write_makes_the_etag_stale(client, librarian, reader, write, changed):
+    from app.utils.response_cache import catalog_cache
+
+    book_id = add_book(client, librarian, copies=2)
+    add_book(client, librarian, copies=1, isbn="spare")  # one without requests, for delete
+    request_id = request_loan(client, reader, book_id)
+    if write is give_back:
+        decide(client, librarian, request_id, "approved")
+    paths = {template: template.format(id=book_id) for template in (LIST, BOOK)}
+    tags = {template: etag(client, path) for template, path in paths.items()}
+    version = catalog_cache.version
+
+    write(client, librarian, book_id, request_id)
+
+    assert catalog_cache.version > version
+    for template, path in paths.items():
+        status = client.get(path, headers={"If-None-Match": tags[template]}).status_code
+        assert status == (200 if template in changed else 304), path
@@ -0,0 +1,80 @@
+"""Catalog search: the in-process index and the MySQL query built to match it."""
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import mysql
+
+
+def book(book_id: int, title: str, author: str, isbn: str | None = None):
+    return SimpleNamespace(id=book_id, title=title, author=author, isbn=isbn)
+
+
+def catalog():
+    from app.utils.search import InvertedIndex
+
+    index = InvertedIndex()
+    index.build([
+        (1, "Dune", "Frank Herbert", "isbn-1"),
+        (2, "Dune Messiah", "Frank Herbert", "isbn-2"),
+        (3, "The Left Hand of Darkness", "Ursula K. Le Guin", "isbn-3"),
+    ])
+    return index
+
+
+def test_last_word_is_a_prefix():
+    index = catalog()
+    assert index.search("dun", 10) == [1, 2]
+    assert index.search("dune mess", 10) == [2, 1]
+    # Only the last word is a prefix
+    assert index.search("mess dune", 10) == [1, 2]
+    assert index.search("dar", 10) == [3]
+
+
+def test_books_matching_more_words_rank_first():
+    # Title words weigh more than author words, but matching both words beats either weight
+    assert catalog().search("herbert messiah", 10) == [2, 1]
+
+
+def test_exact_isbn_comes_first():
+    index = catalog()
+    index.add(book(4, "Herbert's Dune Companion", "Someone", "isbn-9"))
+    assert index.search("isbn-3", 10)[0] == 3
+    assert index.search("isbn-9", 1) == [4]
+
+
+def test_add_update_and_remove():
+    index = catalog()
+    index.add(book(4, "Children of Dune", "Frank Herbert", "isbn-4"))
+    assert 4 in index.search("children", 10)
+
+    index.add(book(4, "God Emperor", "Frank Herbert", "isbn-5"))
+    assert index.search("children", 10) == []
+    assert index.search("emperor", 10) == [4]
+    assert index.search("isbn-4", 10) == []
+    assert index.search("isbn-5", 10) == [4]
+
+    index.remove(4)
+    assert index.search("emperor", 10) == []
+    assert index.search("emp", 10) == []
+    assert index.search("isbn-5", 10) == []
+
+
+def test_changes_before_the_build_are_ignored():
+    from app.utils.search import InvertedIndex
+
+    index = InvertedIndex()
+    index.add(book(1, "Dune", "Frank Herbert"))
+    assert not index.ready
+    index.build([])
+    assert index.search("dune", 10) == []
+
+
+def test_mysql_query_matches_like_the_index():
+    from app.models import Book
+    from app.utils.search import boolean_query
+    from sqlalchemy.dialects.mysql import match
+
+    assert boolean_query("Dune mess") == "dune mess*"
+    assert boolean_query("+dune -messiah") == "dune messiah*"
+    assert boolean_query("!!") == ""
+    sql = str(match(Book.title, Book.author, against=boolean_query("dun")).in_boolean_mode().compile(dialect=mysql.dialect()))
+    assert sql == "MATCH (books.title, books.author) AGAINST (%s IN BOOLEAN MODE)"